@@ -0,0 +1,54 @@
+# aggregates.py
+# Counts over the election tables, computed by the database. None of these
+# transfer rows, only the number in the response's Content-Range header.
+
+GENDERS = ('Male', 'Female')
+
+
+def count_rows(client, table, key_column, **filters):
+    """
+    Exact number of rows in table matching the equality filters.
+    """
+    query = client.table(table).select(key_column, count='exact', head=True)
+    for column, value in filters.items():
+        query = query.eq(column, str(value))
+    return query.execute().count or 0
+
+
+def count_voters(client, election_id, **filters):
+    return count_rows(client, 'Voter', 'voter_id', election_id=election_id, **filters)
+
+
+def count_ballots(client, election_id):
+    return count_rows(client, 'Votes', 'vote_id', election_id=election_id)
+
+
+def count_candidates(client, election_id):
+    return count_rows(client, 'Candidate', 'candidate_id', election_id=election_id)
+
+
+def voter_demographics(client, election_id):
+    """
+    Registered voters of an election in total and per gender, one count
+    query each. Everyone not Male or Female is counted as Others.
+    """
+    total = count_voters(client, election_id)
+    counts = {gender: count_voters(client, election_id, gender=gender) for gender in GENDERS}
+    counts['Others'] = total - sum(counts.values())
+    return total, counts
+
+
+def ballots_counter(client, election_id):
+    """
+    Ballots folded into the running tally, read from its maintained counter
+    so the cost does not grow with turnout. Falls back to counting Votes
+    when the election has no tally row yet. A ballot whose tally update
+    failed is missing until the next rebuild, so results use count_ballots.
+    """
+    result = client.table('ElectionTally')\
+        .select('ballot_count')\
+        .eq('election_id', str(election_id))\
+        .execute()
+    if result.data:
+        return result.data[0]['ballot_count']
+    return count_ballots(client, election_id)
@@ -1,15 +1,11 @@
 # app.py
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
 from phe import paillier
 from datetime import datetime
 import os
-import pandas as pd
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
 from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.primitives.ciphers import aead
 from base64 import b64encode, b64decode
 from datetime import datetime
 import uuid
@@ -17,113 +13,155 @@ import json
 import bcrypt
 from dotenv import load_dotenv, dotenv_values
 import random
+import threading
+import multiprocessing
+import click
+import itertools
+from collections import deque
+import time
+import sqlite3
+from tally import (
+    load_encrypted_vote, fold_ballot, serialize_tally, decrypt_ciphertexts,
+    is_valid_vote_vector, ShardedTallyEngine,
+    packed_slot_bits, packed_ballot_fits, pack_vote_vector, unpack_counts
+)
+from obfuscators import ObfuscatorPoolManager, generate_obfuscators
+from fast_encrypt import generate_encryption_base
+from keypool import KeypairPool, BackgroundJobs
+from keycache import PrivateKeyCache
+from key_storage import wrap_private_key, unwrap_private_key
+from crypto_service import CryptoService, CryptoUnavailable, CryptoBusy, CryptoTimeout, parse_timeouts
+from ballot_codec import encode_ciphertexts, ciphertext_width, is_legacy_encoding
+from election_cache import ElectionCache
+from aggregates import count_voters, count_ballots, count_candidates, voter_demographics, ballots_counter
+from ballot_journal import BallotJournal
+from ballot_proofs import BatchVerifier, ballot_context
+from db_pool import create_http_client, ParallelLookups, LookupTimeout
+from sqlite_store import SQLiteStore
+from metrics import (
+    registry, request_seconds, current_trace, crypto_timer, crypto_seconds, crypto_operations,
+    server_timing, InstrumentedClient
+)
+from voted_index import VotedIndex
+from results_snapshot import ResultsCache, ResultsScheduler, make_snapshot, snapshot_from
+from turnout import TurnoutTracker, TurnoutFull
+from voter_import import VoterImporter, read_voter_chunks, missing_columns
 
 config = dotenv_values(".env")
 
 app = Flask(__name__)
 cors = CORS(app)
 
-# Initialize Supabase client
-supabase_url = config["SUPABASE_URL"]
-supabase_key = config["SUPABASE_KEY"]
-supabase: Client = create_client(supabase_url, supabase_key)
-
-class SecureKeyStorage:
-    def __init__(self, master_key_env='MASTER_KEY'):
-        """
-        Initialize secure storage with a master key.
-        Master key should be set as an environment variable.
-        """
-        self.master_key = config[master_key_env]
-        if not self.master_key:
-            raise ValueError(f"Environment variable {master_key_env} not set")
-        
-        # Convert master key from hex string to bytes
-        self.master_key = bytes.fromhex(self.master_key)
-        
-    def _generate_key_id(self):
-        """Generate a unique identifier for the key"""
-        return str(uuid.uuid4())
-
-    def encrypt_private_key(self, private_key_data):
-        """
-        Encrypt a private key using AES-GCM.
-        Returns: (encrypted_key, key_id)
-        """
-        # Generate a unique salt for this encryption
-        salt = os.urandom(16)
-        
-        # Generate a unique nonce for AES-GCM
-        nonce = os.urandom(12)
-        
-        # Generate an encryption key using PBKDF2
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        key = kdf.derive(self.master_key)
-        
-        # Create AESGCM cipher
-        aesgcm = aead.AESGCM(key)
-        
-        # Encrypt the private key
-        ciphertext = aesgcm.encrypt(
-            nonce,
-            private_key_data.encode() if isinstance(private_key_data, str) else private_key_data,
-            None  # Additional data if needed
-        )
-        
-        # Combine salt, nonce, and ciphertext for storage
-        encrypted_data = salt + nonce + ciphertext
-        
-        # Generate a unique ID for this key
-        key_id = self._generate_key_id()
-        
-        return b64encode(encrypted_data).decode('utf-8'), key_id
-
-    def decrypt_private_key(self, encrypted_data):
-        """
-        Decrypt an encrypted private key.
-        """
-        # Decode from base64
-        encrypted_data = b64decode(encrypted_data)
-        
-        # Extract components
-        salt = encrypted_data[:16]
-        nonce = encrypted_data[16:28]
-        ciphertext = encrypted_data[28:]
-        
-        # Regenerate the encryption key
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        key = kdf.derive(self.master_key)
-        
-        # Decrypt
-        aesgcm = aead.AESGCM(key)
-        decrypted_data = aesgcm.decrypt(nonce, ciphertext, None)
-        
-        return decrypted_data
+# Storage backend. Handlers only use the table(...) query API, which the
+# Supabase client and the embedded SQLite engine both provide.
+STORAGE_BACKEND = config.get('STORAGE_BACKEND') or 'supabase'
+
+if STORAGE_BACKEND == 'sqlite':
+    supabase = SQLiteStore(config.get('SQLITE_PATH') or 'election.db')
+else:
+    # One keep-alive connection pool shared by every request thread
+    db_http_client = create_http_client(
+        max_connections=int(config.get('DB_MAX_CONNECTIONS') or 100),
+        max_keepalive=int(config.get('DB_MAX_KEEPALIVE') or 20),
+        timeout=float(config.get('DB_TIMEOUT') or 10),
+        http2=(config.get('DB_HTTP2') or '').lower() in ('1', 'true', 'yes')
+    )
+    supabase: Client = create_client(
+        config["SUPABASE_URL"],
+        config["SUPABASE_KEY"],
+        options=ClientOptions(httpx_client=db_http_client)
+    )
+
+# Time every query per table and operation
+supabase = InstrumentedClient(supabase)
+
+# Request latency for /metrics. Clients sending an X-Trace header get a
+# Server-Timing header breaking the request down into db, crypto and the rest.
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.trace_token = current_trace.set([] if request.headers.get('X-Trace') else None)
+
+@app.after_request
+def record_request_time(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+
+    elapsed = time.perf_counter() - started
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    request_seconds.observe(elapsed, endpoint=endpoint, method=request.method, status=response.status_code)
+
+    trace = current_trace.get()
+    if trace is not None:
+        response.headers['Server-Timing'] = server_timing(trace, elapsed)
+    current_trace.reset(g.pop('trace_token'))
+    return response
+
+METRICS_ALLOW_REMOTE = (config.get('METRICS_ALLOW_REMOTE') or '').lower() in ('1', 'true', 'yes')
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Local scrapers only unless METRICS_ALLOW_REMOTE is set
+    if not METRICS_ALLOW_REMOTE and request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({'error': 'Forbidden'}), 403
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+# Independent lookups inside a handler run concurrently, bounded by DB_LOOKUP_TIMEOUT
+lookups = ParallelLookups(
+    workers=int(config.get('DB_LOOKUP_WORKERS') or 16),
+    timeout=float(config.get('DB_LOOKUP_TIMEOUT') or 5)
+)
+
+@app.errorhandler(LookupTimeout)
+def lookup_timeout(e):
+    return jsonify({'error': 'Database lookup timed out'}), 504
+
+# Paillier and PBKDF2 work of request handlers runs on this process pool,
+# sized for the crypto load independently of the web workers
+crypto = CryptoService(
+    workers=int(config.get('CRYPTO_WORKERS') or config.get('TALLY_WORKERS') or 0) or None,
+    max_queue=int(config.get('CRYPTO_MAX_QUEUE') or 256),
+    admission_timeout=float(config.get('CRYPTO_ADMISSION_TIMEOUT') or 1),
+    default_timeout=float(config.get('CRYPTO_TIMEOUT') or 30),
+    timeouts={
+        'pbkdf2': 10, 'encrypt': 10, 'decrypt': 10, 'verify_proof': 30,
+        **parse_timeouts(config.get('CRYPTO_TIMEOUTS'))
+    }
+)
+
+@app.errorhandler(CryptoBusy)
+def crypto_busy(e):
+    return jsonify({'error': 'Server is busy, try again shortly'}), 503, {'Retry-After': '1'}
+
+@app.errorhandler(CryptoTimeout)
+def crypto_timeout(e):
+    return jsonify({'error': 'Crypto operation timed out'}), 504
 
 def store_election_keys(election_id, private_key, supabase):
     """
     Store election keys securely in the database.
     """
     try:
-        # Initialize secure storage
-        key_storage = SecureKeyStorage()
-
         # Serialize the private key
         serialized_private_key = serialize_private_key(private_key)
         
-        # Encrypt the private key (which is now in bytes format)
-        encrypted_key, key_id = key_storage.encrypt_private_key(serialized_private_key)
+        # Encrypt the private key (which is now in bytes format) on the crypto workers
+        with crypto_timer('pbkdf2'):
+            encrypted_key, key_id = crypto.run('pbkdf2', wrap_private_key, config.get('MASTER_KEY'), serialized_private_key)
+        
+        return store_encrypted_election_key(election_id, encrypted_key, key_id, supabase)
         
+    except CryptoUnavailable:
+        raise
+    except Exception as e:
+        raise Exception(f"Failed to store election keys: {str(e)}")
+
+def store_encrypted_election_key(election_id, encrypted_key, key_id, supabase):
+    """
+    Store an already encrypted private key for an election.
+    """
+    try:
         # Store encrypted key data
         key_data = {
             'key_id': key_id,
@@ -165,24 +203,80 @@ def retrieve_private_key(election_id):
             
         encrypted_key = result.data[0]['encrypted_private_key']
         
-        # Initialize secure storage and decrypt
-        key_storage = SecureKeyStorage()
-        private_key = key_storage.decrypt_private_key(encrypted_key)
+        # Decrypt on the crypto workers, the PBKDF2 is the slow part
+        with crypto_timer('pbkdf2'):
+            private_key = crypto.run('pbkdf2', unwrap_private_key, config.get('MASTER_KEY'), encrypted_key)
         
         return private_key
         
+    except CryptoUnavailable:
+        raise
     except Exception as e:
         raise Exception(f"Failed to retrieve private key: {str(e)}")
 
-class ElectionSystem:
-    def __init__(self):
-        self.public_key, self.private_key = None, None
-
-    def generate_new_keypair(self):
-        self.public_key, self.private_key = paillier.generate_paillier_keypair()
-        return self.public_key, self.private_key
-
-election_system = ElectionSystem()
+def load_private_key(election_id, public_key):
+    """
+    Retrieve the private key of an election and rebuild the Paillier key object.
+    """
+    private_key_data = json.loads(retrieve_private_key(election_id).decode())
+    return paillier.PaillierPrivateKey(
+        public_key,
+        int(private_key_data['p']),
+        int(private_key_data['q'])
+    )
+
+# Reconstructed private keys, so repeated decryptions skip the database and PBKDF2
+private_key_cache = PrivateKeyCache(
+    max_size=int(config.get('KEY_CACHE_SIZE') or 32),
+    ttl=int(config.get('KEY_CACHE_TTL') or 300)
+)
+
+# New elections get a fixed encryption base, so their ballots are encrypted
+# with the short-exponent fixed-base engine (fast_encrypt) instead of a full r^n
+FAST_ENCRYPTION = (config.get('FAST_ENCRYPTION') or '').lower() in ('1', 'true', 'yes')
+
+def prepare_election_keypair(public_key, private_key):
+    """
+    Encrypt the private key for storage ahead of time, so creating an
+    election does not pay for the PBKDF2. Only the public key and the
+    encrypted private key are kept in the pool.
+    """
+    encrypted_key, key_id = crypto.run('pbkdf2', wrap_private_key, config.get('MASTER_KEY'), serialize_private_key(private_key))
+    keypair = {
+        'public_key': public_key,
+        'encrypted_private_key': encrypted_key,
+        'key_id': key_id
+    }
+    if FAST_ENCRYPTION:
+        keypair['encryption_base'] = crypto.run('encrypt', generate_encryption_base, public_key.n)
+    return keypair
+
+# Keypairs generated in the background for create_election
+keypair_pool = KeypairPool(
+    prepare_election_keypair,
+    size=int(config.get('KEYPAIR_POOL_SIZE') or 2),
+    n_length=int(config.get('PAILLIER_KEY_BITS') or paillier.DEFAULT_KEYSIZE)
+)
+election_jobs = BackgroundJobs(workers=int(config.get('ELECTION_JOB_WORKERS') or 2))
+
+# Not in spawned crypto workers, which import this module too
+if multiprocessing.parent_process() is None:
+    keypair_pool.start()
+
+# Precomputed r^n mod n^2 factors per election, so cast_vote skips the modexp
+obfuscator_pools = ObfuscatorPoolManager(
+    low_watermark=int(config.get('OBFUSCATOR_POOL_LOW') or 64),
+    high_watermark=int(config.get('OBFUSCATOR_POOL_HIGH') or 512),
+    workers=int(config.get('OBFUSCATOR_WORKERS') or 1),
+    batch_size=int(config.get('OBFUSCATOR_BATCH_SIZE') or 32),
+    # An empty pool computes the factor on the crypto workers, not in the request thread
+    generate=lambda n, count, base=None: crypto.run('encrypt', generate_obfuscators, n, count, base)
+)
+
+def election_encryption_base(election):
+    """The election's fixed encryption base h^n mod n^2, or None."""
+    base = election.get('encryption_base')
+    return int(base) if base else None
 
 def serialize_public_key(public_key):
     return json.dumps({
@@ -196,6 +290,278 @@ def serialize_private_key(private_key):
         'q': str(private_key.q)
     })
 
+# Election rows and candidate lists, shared by the voter-facing endpoints
+election_cache = ElectionCache(
+    max_size=int(config.get('ELECTION_CACHE_SIZE') or 256),
+    ttl=int(config.get('ELECTION_CACHE_TTL') or 60)
+)
+
+def fetch_election(election_id):
+    """
+    Election row by id through the metadata cache, or None if it does not exist.
+    """
+    def load():
+        result = supabase.table('Election').select('*').eq('election_id', str(election_id)).execute()
+        return result.data[0] if result.data else None
+    return election_cache.get_election(election_id, load)
+
+def fetch_election_by_public_key(serialized_public_key):
+    """
+    Election row a voter belongs to, looked up by its public key, or None.
+    """
+    def load():
+        result = supabase.table('Election').select('*').eq('public_key', serialized_public_key).execute()
+        return result.data[0] if result.data else None
+    return election_cache.get_election_by_public_key(serialized_public_key, load)
+
+def fetch_voter_election(voter):
+    """
+    Election row of a voter. Voters carry election_id; rows from before the
+    backfill migration are still matched by their copy of the public key.
+    """
+    if voter.get('election_id'):
+        return fetch_election(voter['election_id'])
+    return fetch_election_by_public_key(voter.get('public_key'))
+
+def fetch_candidates(election_id):
+    """
+    Candidates of an election through the metadata cache.
+    """
+    def load():
+        return supabase.table('Candidate').select('*').eq('election_id', str(election_id)).execute().data
+    return election_cache.get_candidates(election_id, load)
+
+# Encrypted running tally: one aggregate ciphertext per candidate slot, kept in ElectionTally
+TALLY_MAX_RETRIES = int(config.get('TALLY_MAX_RETRIES') or 5)
+tally_locks = {}
+tally_locks_guard = threading.Lock()
+
+# Recomputing a tally from Votes is sharded over the crypto workers
+tally_engine = ShardedTallyEngine(crypto, shard_size=int(config.get('TALLY_SHARD_SIZE') or 5000))
+
+def get_tally_lock(election_id):
+    with tally_locks_guard:
+        return tally_locks.setdefault(election_id, threading.Lock())
+
+def load_election_tally(election_id):
+    """
+    Fetch the stored encrypted tally for an election, or None if it has none.
+    """
+    result = supabase.table('ElectionTally')\
+        .select('encrypted_tally', 'ballot_count', 'version')\
+        .eq('election_id', election_id)\
+        .execute()
+
+    if not result.data:
+        return None
+
+    row = result.data[0]
+    return {
+        'aggregate': load_encrypted_vote(row['encrypted_tally']),
+        'ballot_count': row['ballot_count'],
+        'version': row['version']
+    }
+
+def store_election_tally(election_id, public_key, aggregate, ballot_count, version):
+    """
+    Write the tally only if nobody changed it since `version` was read
+    (compare-and-swap). version is None when the row does not exist yet.
+    Returns True if the write went through.
+    """
+    tally_data = {
+        'encrypted_tally': serialize_tally(public_key, aggregate),
+        'ballot_count': ballot_count,
+        'version': (version or 0) + 1,
+        'updated_at': datetime.now().isoformat()
+    }
+
+    if version is None:
+        try:
+            supabase.table('ElectionTally').insert({'election_id': election_id, **tally_data}).execute()
+            return True
+        except Exception:
+            # Another worker created the row first
+            return False
+
+    result = supabase.table('ElectionTally')\
+        .update(tally_data)\
+        .eq('election_id', election_id)\
+        .eq('version', version)\
+        .execute()
+    return bool(result.data)
+
+def update_election_tally(election_id, public_key, *ballots):
+    """
+    Fold newly cast ballots (each a list of ciphertexts) into the election's encrypted tally.
+    Updates are serialized per election inside this process, and the
+    version compare-and-swap keeps other worker processes from losing a ballot.
+    Returns False if the election has no tally row (created before running tallies).
+    """
+    with get_tally_lock(election_id):
+        for attempt in range(TALLY_MAX_RETRIES):
+            tally = load_election_tally(election_id)
+            if tally is None:
+                return False
+
+            aggregate = tally['aggregate']
+            with crypto_timer('tally_fold', len(ballots)):
+                for ciphertexts in ballots:
+                    aggregate = fold_ballot(public_key, aggregate, ciphertexts)
+            if store_election_tally(election_id, public_key, aggregate, tally['ballot_count'] + len(ballots), tally['version']):
+                return True
+
+    raise Exception("Failed to update election tally: too many concurrent updates")
+
+def iter_vote_pages(election_id, page_size):
+    """
+    Yield the encrypted votes of an election in pages of page_size, using
+    keyset pagination on vote_id so no page is skipped or fetched twice.
+    """
+    last_vote_id = None
+    while True:
+        query = supabase.table('Votes')\
+            .select('vote_id', 'encrypted_vote')\
+            .eq('election_id', election_id)
+        if last_vote_id is not None:
+            query = query.gt('vote_id', last_vote_id)
+        page = query.order('vote_id').limit(page_size).execute().data
+
+        if page:
+            yield [vote['encrypted_vote'] for vote in page]
+        if len(page) < page_size:
+            return
+        last_vote_id = page[-1]['vote_id']
+
+def compute_election_tally(election_id, public_key):
+    """
+    Recompute the encrypted tally from the raw rows in Votes.
+    Every page of votes is one shard for the tally engine.
+    """
+    aggregate, ballot_count, report = tally_engine.aggregate(
+        public_key,
+        iter_vote_pages(election_id, tally_engine.shard_size)
+    )
+    return {'aggregate': aggregate, 'ballot_count': ballot_count, 'shards': report}
+
+def rebuild_election_tally(election_id, public_key):
+    """
+    Replace the stored tally with one recomputed from Votes.
+    Ballots that are inserted but not yet folded while this runs would be
+    counted twice, so only rebuild closed elections or during maintenance.
+    """
+    with get_tally_lock(election_id):
+        for attempt in range(TALLY_MAX_RETRIES):
+            stored = load_election_tally(election_id)
+            tally = compute_election_tally(election_id, public_key)
+            version = stored['version'] if stored else None
+            if store_election_tally(election_id, public_key, tally['aggregate'], tally['ballot_count'], version):
+                return tally
+
+    raise Exception("Failed to rebuild election tally: too many concurrent updates")
+
+@app.cli.command('rebuild-tally')
+@click.argument('election_id')
+@click.option('--check', is_flag=True, help='Only compare the stored tally with the votes, do not write it.')
+def rebuild_tally_command(election_id, check):
+    """Recompute the encrypted running tally of an election from its votes."""
+    election = supabase.table('Election').select('public_key').eq('election_id', election_id).execute()
+    if not election.data:
+        raise click.ClickException('Election not found')
+
+    public_key_data = json.loads(election.data[0]['public_key'])
+    public_key = paillier.PaillierPublicKey(int(public_key_data['n']))
+
+    if not check:
+        tally = rebuild_election_tally(election_id, public_key)
+        for shard in tally['shards']:
+            click.echo(f"shard {shard['shard']}: {shard['ballots']} ballots in {shard['seconds']}s")
+        click.echo(f"Rebuilt tally for {election_id} from {tally['ballot_count']} ballots")
+        # Results taken from the old tally are recomputed on the next request
+        invalidate_results_snapshot(election_id)
+        return
+
+    stored = load_election_tally(election_id)
+    recomputed = compute_election_tally(election_id, public_key)
+    if stored is None:
+        raise click.ClickException(f"No stored tally for {election_id}")
+    if stored['ballot_count'] != recomputed['ballot_count'] or stored['aggregate'] != recomputed['aggregate']:
+        raise click.ClickException(
+            f"Stored tally for {election_id} does not match the votes "
+            f"({stored['ballot_count']} folded, {recomputed['ballot_count']} cast)"
+        )
+    click.echo(f"Stored tally for {election_id} matches {recomputed['ballot_count']} ballots")
+
+@app.cli.command('migrate-ballots')
+@click.option('--election-id', default=None, help='Only re-encode the votes of this election.')
+@click.option('--batch-size', default=500, show_default=True, help='Votes fetched per page.')
+@click.option('--dry-run', is_flag=True, help='Only count the rows that still use the JSON format.')
+def migrate_ballots_command(election_id, batch_size, dry_run):
+    """Re-encode legacy JSON ballots and tallies in the binary format."""
+    widths = {}
+
+    def width_for(row_election_id):
+        # Ciphertext width per election, from its public key
+        if row_election_id not in widths:
+            election = supabase.table('Election').select('public_key').eq('election_id', row_election_id).execute()
+            if election.data:
+                public_key_data = json.loads(election.data[0]['public_key'])
+                widths[row_election_id] = ciphertext_width(paillier.PaillierPublicKey(int(public_key_data['n'])))
+            else:
+                widths[row_election_id] = None
+        return widths[row_election_id]
+
+    migrated_votes = 0
+    skipped_votes = 0
+    last_vote_id = None
+    while True:
+        query = supabase.table('Votes').select('vote_id', 'election_id', 'encrypted_vote')
+        if election_id:
+            query = query.eq('election_id', election_id)
+        if last_vote_id is not None:
+            query = query.gt('vote_id', last_vote_id)
+        page = query.order('vote_id').limit(batch_size).execute().data
+
+        for vote in page:
+            if not is_legacy_encoding(vote['encrypted_vote']):
+                continue
+
+            width = width_for(vote['election_id'])
+            if width is None:
+                skipped_votes += 1
+                continue
+
+            if not dry_run:
+                encoded = encode_ciphertexts(load_encrypted_vote(vote['encrypted_vote']), width)
+                supabase.table('Votes').update({'encrypted_vote': encoded}).eq('vote_id', vote['vote_id']).execute()
+            migrated_votes += 1
+
+        if len(page) < batch_size:
+            break
+        last_vote_id = page[-1]['vote_id']
+
+    migrated_tallies = 0
+    query = supabase.table('ElectionTally').select('election_id', 'encrypted_tally', 'version')
+    if election_id:
+        query = query.eq('election_id', election_id)
+    for tally in query.execute().data:
+        if not is_legacy_encoding(tally['encrypted_tally']) or width_for(tally['election_id']) is None:
+            continue
+
+        if not dry_run:
+            encoded = encode_ciphertexts(load_encrypted_vote(tally['encrypted_tally']), width_for(tally['election_id']))
+            # Same compare-and-swap as cast_vote, a concurrent fold wins and is re-encoded on the next run
+            supabase.table('ElectionTally')\
+                .update({'encrypted_tally': encoded, 'version': tally['version'] + 1})\
+                .eq('election_id', tally['election_id'])\
+                .eq('version', tally['version'])\
+                .execute()
+        migrated_tallies += 1
+
+    action = 'Would re-encode' if dry_run else 'Re-encoded'
+    click.echo(f"{action} {migrated_votes} votes and {migrated_tallies} tallies")
+    if skipped_votes:
+        click.echo(f"Skipped {skipped_votes} votes whose election no longer exists")
+
 @app.route('/api/admin/create', methods=['POST'])
 def create_admin():
     data = request.json
@@ -265,12 +631,11 @@ def get_election(election_id):
     # Fetch election details from Supabase
     try:
         # Query the election table for the given election_id
-        response = supabase.table('Election').select('*').eq('election_id', election_id).execute()
+        election = fetch_election(election_id)
         
         # Check if any rows were returned
-        if response.data:
-            # Return the first (and presumably only) election record
-            return jsonify(response.data[0]), 200
+        if election:
+            return jsonify(election), 200
         else:
             return jsonify({'error': 'Election not found'}), 404
     except Exception as e:
@@ -282,28 +647,47 @@ def create_election():
     election_name = data.get('election_name')
     start_time = data.get('start_time')
     end_time = data.get('end_time')
-    
-    # Generate new keypair for this election
-    public_key, private_key = election_system.generate_new_keypair()
+
+    # Packed elections encrypt the whole vote vector as one ciphertext
+    ballot_options = {'ballot_mode': data.get('ballot_mode') or 'vector'}
+    if ballot_options['ballot_mode'] not in ('vector', 'packed'):
+        return jsonify({'error': 'ballot_mode must be "vector" or "packed"'}), 400
+
+    if ballot_options['ballot_mode'] == 'packed':
+        max_voters = data.get('max_voters')
+        max_candidates = data.get('max_candidates')
+        if not isinstance(max_voters, int) or not isinstance(max_candidates, int) or max_voters < 1 or max_candidates < 1:
+            return jsonify({'error': 'Packed elections need positive max_voters and max_candidates'}), 400
+
+        # Every candidate slot must hold max_voters without overflowing into the next one
+        slot_bits = packed_slot_bits(max_voters)
+        if not packed_ballot_fits(keypair_pool.n_length, slot_bits, max_candidates):
+            return jsonify({'error': f'{max_candidates} slots of {slot_bits} bits do not fit in one {keypair_pool.n_length}-bit plaintext'}), 400
+
+        ballot_options.update({
+            'slot_bits': slot_bits,
+            'max_voters': max_voters,
+            'max_candidates': max_candidates
+        })
     
     try:
         election_id = str(uuid.uuid4())
 
-        election_data = {
-            'election_id': election_id,
-            'election_name': election_name,
-            'public_key': serialize_public_key(public_key),
-            'start_time': start_time,
-            'end_time': end_time,
-            'status': 'ongoing',
-            'created_at': datetime.now().isoformat()
-        }
-        
-         # Store the election data
-        result = supabase.table('Election').insert(election_data).execute()
-        
-        # Store the private key securely
-        key_id = store_election_keys(election_id, private_key, supabase)
+        # Use a pre-generated keypair for this election
+        keypair = keypair_pool.take()
+
+        if keypair is None:
+            # Pool is empty: generate the keypair in a background job the client can poll
+            job_id = election_jobs.submit(create_election_job, election_id, election_name, start_time, end_time, ballot_options)
+            return jsonify({
+                'success': True,
+                'pending': True,
+                'election_id': election_id,
+                'job_id': job_id,
+                'status_url': f'/api/election/create/status/{job_id}'
+            }), 202
+
+        create_election_record(election_id, election_name, start_time, end_time, keypair, ballot_options)
 
         return jsonify({
             'success': True,
@@ -313,6 +697,71 @@ def create_election():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def create_election_record(election_id, election_name, start_time, end_time, keypair, ballot_options):
+    """
+    Insert the election, its encrypted private key and its empty tally.
+    """
+    public_key = keypair['public_key']
+
+    election_data = {
+        'election_id': election_id,
+        'election_name': election_name,
+        'public_key': serialize_public_key(public_key),
+        'start_time': start_time,
+        'end_time': end_time,
+        'status': 'ongoing',
+        'created_at': datetime.now().isoformat(),
+        **ballot_options
+    }
+    if keypair.get('encryption_base'):
+        election_data['encryption_base'] = str(keypair['encryption_base'])
+    
+     # Store the election data
+    result = supabase.table('Election').insert(election_data).execute()
+    election_cache.invalidate(election_id)
+
+    # Start an empty encrypted running tally, cast_vote folds ballots into it
+    store_election_tally(election_id, public_key, [], 0, None)
+
+    # Start precomputing obfuscation factors before the first ballot arrives
+    obfuscator_pools.get_pool(election_id, public_key, election_encryption_base(election_data))
+
+    # Have the results ready when the election closes
+    results_scheduler.schedule(election_id, end_time)
+    
+    # Store the private key securely
+    key_id = store_encrypted_election_key(election_id, keypair['encrypted_private_key'], keypair['key_id'], supabase)
+
+def create_election_job(election_id, election_name, start_time, end_time, ballot_options):
+    keypair = keypair_pool.generate()
+    create_election_record(election_id, election_name, start_time, end_time, keypair, ballot_options)
+    return {'election_id': election_id}
+
+@app.route('/api/election/create/status/<job_id>', methods=['GET'])
+def create_election_status(job_id):
+    status = election_jobs.status(job_id)
+    if status is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(status), 200
+
+def voter_roll_room(election):
+    """
+    How many more voters a packed election's roll can take, or None if the
+    roll is unbounded.
+    """
+    if election.get('ballot_mode') != 'packed':
+        return None
+
+    registered = count_voters(supabase, election['election_id'])
+    return max(election['max_voters'] - registered, 0)
+
+def voter_roll_full(election, new_voters):
+    """
+    Whether registering new_voters more voters would exceed a packed election's roll.
+    """
+    room = voter_roll_room(election)
+    return room is not None and new_voters > room
+
 @app.route('/api/voter/register', methods=['POST'])
 def register_voter():
     try:
@@ -327,16 +776,15 @@ def register_voter():
         if missing_fields:
             return jsonify({'error': f'Missing required fields: {", ".join(missing_fields)}'}), 400
 
-        # Get election public key
-        election_result = supabase.table('Election') \
-            .select('public_key') \
-            .eq('election_id', data['election_id']) \
-            .execute()
+        # Get the election
+        election = fetch_election(data['election_id'])
         
-        if not election_result.data:
+        if not election:
             return jsonify({'error': 'Election not found'}), 404
-        
-        election_public_key = election_result.data[0]['public_key']
+
+        # Packed ballot slots are sized for the voter roll, it cannot grow past max_voters
+        if voter_roll_full(election, 1):
+            return jsonify({'error': 'Voter roll is full for this election'}), 400
 
         # Create new voter
         voter_data = {
@@ -344,12 +792,13 @@ def register_voter():
             'name': data['name'],
             'email': data['email'],
             'gender': data['gender'],
-            'public_key': election_public_key,
+            'election_id': election['election_id'],
             'created_at': datetime.now().isoformat()
         }
 
         # Insert into database
         insert_result = supabase.table('Voter').insert(voter_data).execute()
+        results_changed(election)
 
         return jsonify({
             'success': True,
@@ -361,6 +810,55 @@ def register_voter():
         print(f"Error: {str(e)}")  # For debugging
         return jsonify({'error': str(e)}), 500
 
+VOTER_IMPORT_BATCH_SIZE = int(config.get('VOTER_IMPORT_BATCH_SIZE') or 500)
+VOTER_IMPORT_RETRIES = int(config.get('VOTER_IMPORT_RETRIES') or 3)
+# Columns the voter listing returns, the legacy public_key copy is never sent
+VOTER_LIST_COLUMNS = ('voter_id', 'name', 'email', 'gender', 'created_at')
+VOTER_PAGE_SIZE = int(config.get('VOTER_PAGE_SIZE') or 100)
+VOTER_PAGE_MAX = int(config.get('VOTER_PAGE_MAX') or 1000)
+
+def fetch_voter_page(election_id, columns, limit, after=None):
+    """
+    One page of an election's voters ordered by voter_id, starting after the
+    cursor voter_id, with only the given columns.
+    """
+    query = supabase.table('Voter').select(*columns).eq('election_id', str(election_id))
+    if after is not None:
+        query = query.gt('voter_id', after)
+    return query.order('voter_id').limit(limit).execute().data
+
+def iter_voter_pages(election_id, columns, page_size):
+    """
+    Yield every voter of an election in keyset pages of page_size.
+    """
+    last_voter_id = None
+    while True:
+        page = fetch_voter_page(election_id, columns, page_size, last_voter_id)
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        last_voter_id = page[-1]['voter_id']
+
+def load_voter_emails(election_id):
+    """
+    Normalized emails of everyone already registered for an election.
+    """
+    return {
+        str(voter['email']).strip().lower()
+        for page in iter_voter_pages(election_id, ('voter_id', 'email'), VOTER_PAGE_MAX)
+        for voter in page
+        if voter.get('email')
+    }
+
+def insert_voter_batch(voters):
+    # Upsert on the pre-assigned voter_id, so retrying a batch that did land is harmless
+    supabase.table('Voter').upsert(voters, on_conflict='voter_id').execute()
+
+def wants_ndjson():
+    return request.args.get('stream') in ('1', 'true') \
+        or 'application/x-ndjson' in request.headers.get('Accept', '')
+
 @app.route('/api/voter/bulk-register', methods=['POST'])
 def bulk_register_voters():
     try:
@@ -372,46 +870,63 @@ def bulk_register_voters():
         if file.filename == '':
             return jsonify({'error': 'No selected file'}), 400
         
-        # Read the Excel file into a pandas DataFrame
-        df = pd.read_excel(file)
-        
-        # Validate the DataFrame to ensure it has the necessary columns
-        required_columns = ['name', 'email', 'gender']
-        if not all(col in df.columns for col in required_columns):
-            return jsonify({'error': 'Missing required columns in the Excel file'}), 400
-        
-        # Extract the election public key
+        # Get the election
         election_id = request.form.get('election_id')
-        election_result = supabase.table('Election') \
-            .select('public_key') \
-            .eq('election_id', election_id) \
-            .execute()
+        election = fetch_election(election_id)
         
-        if not election_result.data:
+        if not election:
             return jsonify({'error': 'Election not found'}), 404
-        
-        election_public_key = election_result.data[0]['public_key']
 
-        # Prepare the data to insert
-        voters_data = []
-        for index, row in df.iterrows():
-            voter_data = {
-                'voter_id': str(uuid.uuid4()),
-                'name': row['name'],
-                'email': row['email'],
-                'gender': row['gender'].lower().capitalize(),
-                'public_key': election_public_key,
-                'created_at': datetime.now().isoformat()
-            }
-            voters_data.append(voter_data)
-        
-        # Insert data into the database
-        insert_result = supabase.table('Voter').insert(voters_data).execute()
-        
+        # Read the first chunk up front so a bad file is still a plain 400
+        chunks = read_voter_chunks(file.stream, file.filename, VOTER_IMPORT_BATCH_SIZE)
+        try:
+            first_chunk = next(chunks, None)
+        except Exception as e:
+            return jsonify({'error': f'Could not read the voter file: {str(e)}'}), 400
+
+        if first_chunk is None:
+            return jsonify({'error': 'The voter file has no rows'}), 400
+
+        missing = missing_columns(first_chunk)
+        if missing:
+            return jsonify({'error': f'Missing required columns in the voter file: {", ".join(missing)}'}), 400
+
+        importer = VoterImporter(
+            election['election_id'],
+            insert_voter_batch,
+            load_voter_emails(election['election_id']),
+            batch_size=VOTER_IMPORT_BATCH_SIZE,
+            max_retries=VOTER_IMPORT_RETRIES,
+            # Packed ballot slots are sized for the voter roll, it cannot grow past max_voters
+            max_new_voters=voter_roll_room(election)
+        )
+        events = importer.run(itertools.chain([first_chunk], chunks))
+
+        if wants_ndjson():
+            def stream():
+                try:
+                    for event in events:
+                        yield json.dumps(event) + '\n'
+                except Exception as e:
+                    print(f"Error importing voters: {str(e)}")
+                    yield json.dumps({'event': 'error', 'error': str(e), **importer.summary()}) + '\n'
+                finally:
+                    if importer.summary()['inserted']:
+                        results_changed(election)
+
+            return Response(stream_with_context(stream()), mimetype='application/x-ndjson')
+
+        rejected = [event for event in events if event['event'] == 'rejected']
+        summary = importer.summary()
+        if summary['inserted']:
+            results_changed(election)
+
         return jsonify({
             'success': True,
             'message': 'Voters registered successfully',
-            'count': len(voters_data)
+            'count': summary['inserted'],
+            'processed': summary['processed'],
+            'rejected': rejected
         })
 
     except Exception as e:
@@ -454,77 +969,95 @@ def get_election_candidates(voter_id):
         if not voter_data:
             return jsonify({'error': 'Voter not found'}), 404
 
-        voter_public_key = voter_data[0].get('public_key')
-
-        # Query the Election table to find the election_id, start_time, and end_time using the voter's public key
-        election_result = supabase.table('Election').select('election_id', 'start_time', 'end_time').eq('public_key', voter_public_key).execute()
-        election_data = election_result.data
+        # Find the election_id, start_time, and end_time of the voter's election
+        election_info = fetch_voter_election(voter_data[0])
 
-        if not election_data:
+        if not election_info:
             return jsonify({'error': 'Election not found'}), 404
         
-        election_info = election_data[0]
         election_id = election_info.get('election_id')
         start_time = election_info.get('start_time')
         end_time = election_info.get('end_time')
 
-        # Check if the voter has already voted in this election
-        existing_vote = supabase.table('Votes').select('id').eq('voter_id', voter_id).eq('election_id', election_id).execute()
+        # Check whether the voter already voted while fetching the candidates
+        already_voted, candidates = lookups.gather(
+            lambda: has_voted(voter_id, election_id),
+            lambda: fetch_candidates(election_id)
+        )
 
-        if existing_vote.data:
+        if already_voted:
             return jsonify({"status": "error", "message": "Voter has already cast a vote in this election."}), 403
-        
-        # Query the Candidate table to find all candidates for the election_id
-        candidates_result = supabase.table('Candidate').select('*').eq('election_id', election_id).execute()
-        candidates = candidates_result.data
 
         if not candidates:
             return jsonify({'error': 'No candidates found for this election'}), 404
-        print("time",start_time, end_time)
         # Return candidates along with election start and end times
-        return jsonify({
+        response_data = {
             'success': True,
             'candidates': candidates,
             'start_time': start_time,
             'end_time': end_time,
             'election_id': election_id
-        })
+        }
+        # Tell the voting page to encrypt the ballot itself
+        if CLIENT_ENCRYPTION:
+            response_data['encryption'] = ballot_encryption_params(election_info, candidates)
+        return jsonify(response_data)
+    except (LookupTimeout, CryptoUnavailable):
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/voters/<election_id>', methods=['GET'])
 def get_voters(election_id):
-
-    # election_id = data.get('election_id')
-    # election_id = request.args.get('election_id')
-
+    """
+    List an election's voters one page at a time, the first page with the
+    total. Pass the returned next_cursor as ?after= for the next page.
+    With ?format=ndjson (or an
+    Accept: application/x-ndjson header) the whole roll is streamed instead,
+    one voter per line.
+    """
     try:
         # Validate that election_id is a valid UUID
         election_id = uuid.UUID(election_id)
 
-        # Step 1: Retrieve the public key from the Election table using election_id
-        election_result = supabase.table('Election').select('public_key').eq('election_id', str(election_id)).single().execute()
-        # print(election_result)
-        # Access the 'data' attribute instead of using subscripting
-        election_data = election_result.data
-        # print(election_data)
+        # Step 1: Check the election exists
+        election_data = fetch_election(election_id)
         if election_data is None:
             return jsonify({'error': 'Election not found'}), 404
-        
-        election_public_key = election_data['public_key']
-
-        # Step 2: Query the Voter table to find voters whose public key matches the election's public key
-        voters_result = supabase.table('Voter').select('*').eq('public_key', election_public_key).execute()
 
-        # Access the voters data
-        voters = voters_result.data
-        # print(voters)
-        # Step 3: Return the filtered list of voters
-        return jsonify({'voters': voters}), 200
+        # Step 2: Stream the full roll page by page, memory stays at one page
+        if request.args.get('format') == 'ndjson' or wants_ndjson():
+            def stream():
+                for page in iter_voter_pages(election_id, VOTER_LIST_COLUMNS, VOTER_PAGE_MAX):
+                    yield ''.join(json.dumps(voter) + '\n' for voter in page)
+
+            return Response(stream_with_context(stream()), mimetype='application/x-ndjson')
+
+        # Step 3: Otherwise return a single page after the cursor
+        limit = min(int(request.args.get('limit') or VOTER_PAGE_SIZE), VOTER_PAGE_MAX)
+        if limit < 1:
+            return jsonify({'error': 'limit must be positive'}), 400
+        after = request.args.get('after')
+        if after is not None:
+            after = str(uuid.UUID(after))
+
+        # One extra row tells whether another page follows
+        voters = fetch_voter_page(election_id, VOTER_LIST_COLUMNS, limit + 1, after)
+        has_more = len(voters) > limit
+        voters = voters[:limit]
+
+        page = {
+            'voters': voters,
+            'next_cursor': voters[-1]['voter_id'] if has_more else None
+        }
+        # The size of the roll for the page footer, counted once on the first page
+        if after is None:
+            page['total'] = count_voters(supabase, election_id)
+        return jsonify(page), 200
     
     except ValueError:
-        return jsonify({'error': 'Invalid election_id format'}), 400
+        return jsonify({'error': 'Invalid election_id, cursor or limit'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -539,6 +1072,8 @@ def delete_voter(voter_id):
 
         # Check if any row was deleted
         if delete_result.data:
+            if delete_result.data[0].get('election_id'):
+                results_changed(fetch_election(delete_result.data[0]['election_id']))
             return jsonify({'message': 'Voter deleted successfully'}), 200
         else:
             return jsonify({'error': 'Voter not found'}), 404
@@ -557,6 +1092,12 @@ def create_candidate():
     # avatar_url = data.get['avatar_url']
 
     try:
+        # Packed ballots only have max_candidates slots
+        election = fetch_election(election_id)
+        if election and election.get('ballot_mode') == 'packed':
+            if count_candidates(supabase, election_id) >= election['max_candidates']:
+                return jsonify({'error': 'This election already has max_candidates candidates'}), 400
+
         # Insert candidate into the Supabase candidates table
         response = supabase.table('Candidate').insert({
             'candidate_id': str(uuid.uuid4()),
@@ -570,6 +1111,10 @@ def create_candidate():
         if not response.data:
             return jsonify({'error':"something bad happended"}), 400
 
+        # The candidate list of this election changed
+        election_cache.invalidate(election_id)
+        results_changed(election)
+
         return jsonify({'message': 'Candidate created successfully', 'candidate': response.data}), 201
     
     except Exception as e:
@@ -579,116 +1124,435 @@ def create_candidate():
 def get_candidates(election_id):
     try:
         # Query the candidates for the specified election ID
-        response = supabase.table('Candidate').select('*').eq('election_id', election_id).execute()
+        candidates = fetch_candidates(election_id)
         
         # Return the list of candidates
-        return jsonify({'candidates': response.data}), 200
+        return jsonify({'candidates': candidates}), 200
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Results of closed elections are computed once and kept in ElectionResults
+RESULTS_MAX_AGE = int(config.get('RESULTS_MAX_AGE') or 30)
+results_cache = ResultsCache(
+    max_size=int(config.get('RESULTS_CACHE_SIZE') or 256),
+    ttl=int(config.get('RESULTS_CACHE_TTL') or 300)
+)
+
+def election_closed(election):
+    return datetime.now() >= datetime.fromisoformat(election['end_time'])
+
+def ballots_pending(election_id):
+    """
+    True while ballots of the election sit in the journal and are not in
+    Votes yet, results computed now would miss them.
+    """
+    return BALLOT_INGEST_MODE == 'journal' and ballot_journal.find(election_id=str(election_id)) is not None
+
+def load_results_snapshot(election):
+    """
+    Stored results snapshot of a closed election, computing and storing it
+    if it has none yet.
+    """
+    election_id = str(election['election_id'])
+    stored = supabase.table('ElectionResults').select('results', 'etag').eq('election_id', election_id).execute()
+    if stored.data:
+        return snapshot_from(stored.data[0]['results'], stored.data[0]['etag'])
+
+    snapshot = make_snapshot(compute_election_results(election))
+    try:
+        supabase.table('ElectionResults').insert({
+            'election_id': election_id,
+            'results': snapshot['body'],
+            'etag': snapshot['etag'],
+            'created_at': datetime.now().isoformat()
+        }).execute()
+    except Exception as e:
+        # Another worker stored the same results first
+        print(f"Results snapshot for {election_id} not stored: {str(e)}")
+    return snapshot
+
+def invalidate_results_snapshot(election_id):
+    """
+    Drop the results snapshot of an election, the next request recomputes
+    it. Other processes keep theirs until RESULTS_CACHE_TTL runs out.
+    """
+    supabase.table('ElectionResults').delete().eq('election_id', str(election_id)).execute()
+    results_cache.invalidate(election_id)
+
+def results_changed(election):
+    """Call after a write that changes the results of a closed election."""
+    if election and election_closed(election):
+        try:
+            invalidate_results_snapshot(election['election_id'])
+        except Exception as e:
+            print(f"Error dropping the results snapshot of {election['election_id']}: {str(e)}")
+
+def snapshot_response(snapshot):
+    """The snapshot with its strong ETag, or a 304 if the client has it."""
+    response = Response(snapshot['body'], mimetype='application/json')
+    response.set_etag(snapshot['etag'])
+    response.headers['Cache-Control'] = f'public, max-age={RESULTS_MAX_AGE}'
+    return response.make_conditional(request)
+
+def snapshot_closed_election(election_id):
+    """Scheduled at end_time: take the results snapshot ahead of the first request."""
+    election_cache.invalidate(election_id)
+    election = fetch_election(election_id)
+    if not election:
+        return True
+    # The end time moved, or ballots cast before the close are still being written
+    if not election_closed(election) or ballots_pending(election_id):
+        return False
+    results_cache.get(election_id, lambda: load_results_snapshot(election))
+    turnout.forget(election_id)
+    return True
+
+results_scheduler = ResultsScheduler(
+    snapshot_closed_election,
+    delay=int(config.get('RESULTS_SNAPSHOT_DELAY') or 5),
+    retry=int(config.get('RESULTS_SNAPSHOT_RETRY') or 30)
+)
+
+def schedule_results_snapshots():
+    try:
+        elections = supabase.table('Election').select('election_id', 'end_time').gt('end_time', datetime.now().isoformat()).execute().data
+        for election in elections:
+            results_scheduler.schedule(election['election_id'], election['end_time'])
+    except Exception as e:
+        print(f"Error scheduling results snapshots: {str(e)}")
+
+if multiprocessing.parent_process() is None:
+    threading.Thread(target=schedule_results_snapshots, name='results-schedule', daemon=True).start()
+
+# Live turnout for the dashboard while an election is open, counted as ballots are cast
+turnout = TurnoutTracker(
+    lambda election_id: ballots_counter(supabase, election_id),
+    minutes=int(config.get('TURNOUT_RATE_MINUTES') or 60),
+    coalesce=float(config.get('TURNOUT_COALESCE') or 1),
+    resync=int(config.get('TURNOUT_RESYNC') or 30),
+    heartbeat=int(config.get('TURNOUT_HEARTBEAT') or 15),
+    max_subscribers=int(config.get('TURNOUT_MAX_SUBSCRIBERS') or 100)
+)
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/election/<election_id>/turnout/stream', methods=['GET'])
+def stream_turnout(election_id):
+    """
+    Server-sent events with the turnout of an open election: a `turnout`
+    event whenever ballots come in (at most one per TURNOUT_COALESCE
+    seconds), and `closed` once end_time has passed.
+    """
+    election = fetch_election(election_id)
+    if not election:
+        return jsonify({'error': 'Election not found'}), 404
+    if election_closed(election):
+        return jsonify({'error': 'Election has ended'}), 409
+
+    total_voters = count_voters(supabase, election_id)
+    try:
+        updates = turnout.subscribe(election_id, until=datetime.fromisoformat(election['end_time']).timestamp())
+    except TurnoutFull:
+        return jsonify({'error': 'Too many turnout streams open, try again later'}), 503
+
+    def stream():
+        # Have the browser reconnect after 5 seconds if the connection drops
+        yield 'retry: 5000\n\n'
+        for update in updates:
+            if update is None:
+                # Comment line, keeps proxies from closing an idle stream
+                yield ': heartbeat\n\n'
+            else:
+                yield sse_event('turnout', {**update, 'total_voters': total_voters, 'end_time': election['end_time']})
+        yield sse_event('closed', {'election_id': election_id})
+
+    response = Response(stream_with_context(stream()), mimetype='text/event-stream')
+    # Runs however the response ends, even if the client left before the first chunk
+    response.call_on_close(updates.close)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/api/election/<election_id>/results', methods=['GET'])
 def get_election_results(election_id):
     try:
+        verify = request.args.get('verify', '').lower() in ('1', 'true', 'yes')
+
+        # Only closed elections have a snapshot, serve it without touching the database
+        snapshot = results_cache.peek(election_id)
+        if snapshot is not None and not verify:
+            return snapshot_response(snapshot)
+
         # Get election details
-        election = supabase.table('Election')\
-            .select('*')\
-            .eq('election_id', election_id)\
-            .execute()
+        election = fetch_election(election_id)
         
-        if not election.data:
+        if not election:
             return jsonify({'error': 'Election not found'}), 404
-
-        election = election.data[0]
         
         # Check if election has started
         if datetime.now() < datetime.fromisoformat(election['start_time']):
             return jsonify({'error': 'Election has not started yet', "start_time":datetime.fromisoformat(election['start_time'])}), 402
 
-        # Get all votes for this election
-        votes = supabase.table('Votes')\
-            .select('*')\
-            .eq('election_id', election_id)\
-            .execute()
-        
-        # Check if election has ended
-        if datetime.now() < datetime.fromisoformat(election['end_time']):
-            return jsonify({'error': 'Election is still ongoing', "voters_voted":len(votes.data), "end_time": datetime.fromisoformat(election['end_time'])  }), 403
-
-        public_key_data = json.loads(election['public_key'])
-        public_key = paillier.PaillierPublicKey(int(public_key_data['n']))
-
-        private_key_data = json.loads(retrieve_private_key(election_id).decode())
-        private_key = paillier.PaillierPrivateKey(
-            public_key,
-            int(private_key_data['p']),
-            int(private_key_data['q'])
-        )
+        # Check if election has ended, turnout so far comes from the tally's counter
+        if not election_closed(election):
+            voters_voted = ballots_counter(supabase, election_id)
+            return jsonify({'error': 'Election is still ongoing', "voters_voted":voters_voted, "end_time": datetime.fromisoformat(election['end_time'])  }), 403
 
-        total_voters_response = supabase.table('Voter').select('*').eq('public_key', election['public_key']).execute()
-        total_voters = len(total_voters_response.data)
-        voters_voted = len(votes.data)
-
-        # Retrieve candidates for the election
-        response = supabase.table('Candidate').select('*').eq('election_id', election_id).execute()
-        candidates = response.data
-        candidate_ids = {candidate['candidate_id']: candidate['name'] for candidate in candidates}
-        
-        # Initialize tally with candidate IDs set to zero
-        vote_tally = {candidate['name']: 0 for candidate in candidates}
-        # Calculate gender distribution
-        male_count = sum(1 for voter in total_voters_response.data if voter['gender'] == 'Male')
-        female_count = sum(1 for voter in total_voters_response.data if voter['gender'] == 'Female')
-        other_count = total_voters - male_count - female_count
-
-        # Process each encrypted vote
-        for vote in votes.data:
-            encrypted_vote_vector_serialized = json.loads(vote['encrypted_vote'])
-            
-            # Deserialize and reconstruct each EncryptedNumber
-            encrypted_vote_vector = [
-                paillier.EncryptedNumber(public_key, int(num))
-                for num in encrypted_vote_vector_serialized
-            ]
-            
-            # Decrypt each element in the vote vector
-            decrypted_vote_vector = [private_key.decrypt(encrypted_vote) for encrypted_vote in encrypted_vote_vector]
-            
-            # Identify the candidate index with the highest value
-            selected_candidate_index = decrypted_vote_vector.index(max(decrypted_vote_vector))
-            
-            # Map index to candidate ID and update tally
-            selected_candidate_id = list(candidate_ids.keys())[selected_candidate_index]
-            candidate_name = candidate_ids[selected_candidate_id]
-            vote_tally[candidate_name] += 1
+        # A recount is never cached, nor are results that would miss journaled ballots
+        if verify or ballots_pending(election_id):
+            return jsonify(compute_election_results(election, verify))
 
+        return snapshot_response(results_cache.get(election_id, lambda: load_results_snapshot(election)))
 
-        # Construct voting statistics for each candidate
-        voting_stats = [{'name': candidate, 'votes': votes} for candidate, votes in vote_tally.items()]
-        
-        # Construct gender distribution data
-        gender_distribution = [
-            {'name': 'Male', 'value': male_count},
-            {'name': 'Female', 'value': female_count},
-            {'name': 'Others', 'value': other_count}
-        ]
+    except (LookupTimeout, CryptoUnavailable):
+        raise
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        # Return the results
-        return jsonify({
-            'success': True,
-            'electionTitle': election['election_name'],
-            'startDate': datetime.strptime(election['start_time'], "%Y-%m-%dT%H:%M:%S").strftime("%d/%m/%Y"),
-            'endDate': datetime.strptime(election['end_time'], "%Y-%m-%dT%H:%M:%S").strftime("%d/%m/%Y"),
-            'totalVoters': total_voters,
-            'votersVoted': voters_voted,
-            'votingStats': voting_stats,
-            'genderDistribution': gender_distribution,
-            "winner_name": max(vote_tally, key=vote_tally.get),
-            "winner_votes": max(vote_tally.values())
-        })
+def compute_election_results(election, verify=False):
+    """
+    Results payload of a closed election, decrypted from its running tally.
+    With verify the ballots are also recounted one by one.
+    """
+    election_id = str(election['election_id'])
+    public_key_data = json.loads(election['public_key'])
+    public_key = paillier.PaillierPublicKey(int(public_key_data['n']))
+
+    # Exact ballot count (the tally is rebuilt below if it missed any),
+    # voter counts, candidates and the stored tally are independent
+    voters_voted, (total_voters, gender_counts), candidates, tally = lookups.gather(
+        lambda: count_ballots(supabase, election_id),
+        lambda: voter_demographics(supabase, election_id),
+        lambda: fetch_candidates(election_id),
+        lambda: load_election_tally(election_id)
+    )
+
+    # Initialize tally with candidate IDs set to zero
+    vote_tally = {candidate['name']: 0 for candidate in candidates}
+
+    # Use the running tally, rebuilding it if it is missing or some ballot was never folded in
+    if tally is None or tally['ballot_count'] != voters_voted:
+        tally = rebuild_election_tally(election_id, public_key)
+
+    with private_key_cache.lease(election_id, lambda: load_private_key(election_id, public_key)) as private_key:
+        if election.get('ballot_mode') == 'packed':
+            # One ciphertext holds every candidate's count in its own slot
+            with crypto_timer('decrypt'):
+                packed_total = crypto.run(
+                    'decrypt', decrypt_ciphertexts,
+                    public_key.n, private_key.p, private_key.q, tally['aggregate'][:1] or [1]
+                )[0]
+            candidate_counts = unpack_counts(packed_total, election['slot_bits'], len(candidates))
+        else:
+            # Decrypt one aggregate ciphertext per candidate, slots nobody voted for are encryptions of 0
+            aggregate = (tally['aggregate'] + [1] * len(candidates))[:len(candidates)]
+            with crypto_timer('decrypt', len(aggregate)):
+                candidate_counts = crypto.run(
+                    'decrypt', decrypt_ciphertexts, public_key.n, private_key.p, private_key.q, aggregate
+                )
+
+        # Optionally recount ballot by ballot to prove the aggregate matches
+        tally_verified = None
+        if verify:
+            with crypto_timer('verify_decrypt', voters_voted):
+                tally_verified = tally_engine.count(
+                    public_key, private_key, iter_vote_pages(election_id, VERIFY_SHARD_SIZE),
+                    len(candidates), election.get('slot_bits')
+                ) == candidate_counts
+
+    for candidate, count in zip(candidates, candidate_counts):
+        vote_tally[candidate['name']] += count
+
+    # Construct voting statistics for each candidate
+    voting_stats = [{'name': candidate, 'votes': votes} for candidate, votes in vote_tally.items()]
     
+    # Construct gender distribution data
+    gender_distribution = [
+        {'name': name, 'value': value} for name, value in gender_counts.items()
+    ]
+
+    return {
+        'success': True,
+        'electionTitle': election['election_name'],
+        'startDate': datetime.strptime(election['start_time'], "%Y-%m-%dT%H:%M:%S").strftime("%d/%m/%Y"),
+        'endDate': datetime.strptime(election['end_time'], "%Y-%m-%dT%H:%M:%S").strftime("%d/%m/%Y"),
+        'totalVoters': total_voters,
+        'votersVoted': voters_voted,
+        'votingStats': voting_stats,
+        'genderDistribution': gender_distribution,
+        "winner_name": max(vote_tally, key=vote_tally.get),
+        "winner_votes": max(vote_tally.values()),
+        'tallyVerified': tally_verified
+    }
+
+def write_vote_batch(rows):
+    """
+    Insert a batch of ballots, skipping vote_ids already in Votes so a
+    replayed batch is harmless. Returns the rows that were new.
+    """
+    return supabase.table('Votes').upsert(rows, on_conflict='vote_id', ignore_duplicates=True).execute().data
+
+def is_rejected_ballot(error):
+    """
+    Whether the database refused a ballot for good: an integrity
+    constraint (SQLSTATE class 23, e.g. a second ballot for the voter or a
+    deleted voter) or bad data (class 22). Retrying those never succeeds.
+    """
+    if isinstance(error, sqlite3.IntegrityError):
+        return True
+    code = getattr(error, 'code', None)
+    return isinstance(code, str) and code[:2] in ('22', '23')
+
+def release_rejected_ballots(rows):
+    """Give the voters of rejected ballots their claim back, unless a ballot of theirs is stored."""
+    for row in rows:
+        if find_vote(row['voter_id'], row['election_id']) is None:
+            voted_index.release(row['election_id'], row['voter_id'])
+
+def fold_vote_batch(rows):
+    """Fold a committed batch into the running tallies, one update per election."""
+    ballots = {}
+    for row in rows:
+        ballots.setdefault(row['election_id'], []).append(load_encrypted_vote(row['encrypted_vote']))
+
+    for election_id, election_ballots in ballots.items():
+        election = fetch_election(election_id)
+        public_key = paillier.PaillierPublicKey(int(json.loads(election['public_key'])['n']))
+        # Elections without a tally row get theirs rebuilt at close
+        update_election_tally(election_id, public_key, *election_ballots)
+
+# 'direct' inserts each ballot before responding, 'journal' acknowledges once
+# the ballot is in the local journal and inserts in batches in the background.
+# A journal is locked by the process writing it: with several worker
+# processes, run each with its own BALLOT_JOURNAL_PATH.
+BALLOT_INGEST_MODE = config.get('BALLOT_INGEST_MODE') or 'direct'
+ballot_journal = BallotJournal(
+    config.get('BALLOT_JOURNAL_PATH') or 'ballots.journal',
+    write_vote_batch,
+    on_committed=fold_vote_batch,
+    batch_size=int(config.get('BALLOT_BATCH_SIZE') or 100),
+    linger=float(config.get('BALLOT_BATCH_LINGER') or 0.05),
+    max_batch_failures=int(config.get('BALLOT_BATCH_MAX_FAILURES') or 3),
+    is_rejected=is_rejected_ballot,
+    on_rejected=release_rejected_ballots
+)
+
+# Replay ballots left over from a crash as soon as the server is up
+if BALLOT_INGEST_MODE == 'journal' and multiprocessing.parent_process() is None:
+    ballot_journal.start()
+
+def find_vote(voter_id, election_id):
+    """
+    The voter's ballot in an election, including one still queued in the
+    ballot journal, or None if they have not voted.
+    """
+    existing_vote = supabase.table('Votes').select('*').eq('voter_id', voter_id).eq('election_id', election_id).execute()
+    if existing_vote.data:
+        return existing_vote.data[0]
+    if BALLOT_INGEST_MODE == 'journal':
+        return ballot_journal.find(voter_id=voter_id, election_id=election_id)
+    return None
+
+def load_voted_voter_ids(election_id):
+    """
+    voter_ids with a ballot for the election, in Votes or still queued in
+    the ballot journal. Read in keyset pages on vote_id.
+    """
+    voter_ids = []
+    last_vote_id = None
+    while True:
+        query = supabase.table('Votes').select('vote_id', 'voter_id').eq('election_id', election_id)
+        if last_vote_id is not None:
+            query = query.gt('vote_id', last_vote_id)
+        page = query.order('vote_id').limit(VOTER_PAGE_MAX).execute().data
+
+        voter_ids.extend(vote['voter_id'] for vote in page)
+        if len(page) < VOTER_PAGE_MAX:
+            break
+        last_vote_id = page[-1]['vote_id']
+
+    if BALLOT_INGEST_MODE == 'journal':
+        voter_ids.extend(row['voter_id'] for row in ballot_journal.find_all(election_id=election_id))
+    return voter_ids
+
+# Who has already voted, per election, so duplicate checks skip the database
+voted_index = VotedIndex(
+    load_voted_voter_ids,
+    bloom_threshold=int(config.get('VOTED_BLOOM_THRESHOLD') or 100000),
+    bloom_error_rate=float(config.get('VOTED_BLOOM_ERROR_RATE') or 0.001)
+)
+
+def warm_voted_index():
+    """Load the has-voted sets of every election that has not ended yet."""
+    try:
+        elections = supabase.table('Election').select('election_id').gt('end_time', datetime.now().isoformat()).execute().data
+        for election in elections:
+            voted_index.warm(election['election_id'])
+        print(f"Warmed has-voted index for {len(elections)} elections")
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        print(f"Error warming has-voted index: {str(e)}")
+
+if multiprocessing.parent_process() is None:
+    threading.Thread(target=warm_voted_index, name='voted-index-warmup', daemon=True).start()
+
+def has_voted(voter_id, election_id):
+    return voted_index.has_voted(
+        election_id, voter_id,
+        confirm=lambda: find_vote(voter_id, election_id) is not None
+    )
+
+# With CLIENT_ENCRYPTION on, the voting page encrypts the ballot itself and
+# proves it well formed; cast_vote only checks the proofs, in batches
+CLIENT_ENCRYPTION = (config.get('CLIENT_ENCRYPTION') or '').lower() in ('1', 'true', 'yes')
+BALLOT_VERIFY_TIMEOUT = float(config.get('BALLOT_VERIFY_TIMEOUT') or 30)
+ballot_verifier = BatchVerifier(
+    lambda fn, *args: crypto.submit('verify_proof', fn, *args),
+    batch_size=int(config.get('BALLOT_VERIFY_BATCH_SIZE') or 64),
+    linger=float(config.get('BALLOT_VERIFY_LINGER') or 0.01)
+)
+
+def ballot_encryption_params(election, candidates):
+    """What the voting page needs to encrypt a ballot and build its proofs."""
+    packed = election.get('ballot_mode') == 'packed'
+    return {
+        'public_key': json.loads(election['public_key']),
+        'ballot_mode': 'packed' if packed else 'vector',
+        'slot_bits': election.get('slot_bits') if packed else None,
+        'candidates': len(candidates)
+    }
+
+def verify_client_ballot(election, candidates, voter_id, public_key, encrypted_vote, proof):
+    """
+    Check a ballot the voter encrypted in the browser. Returns the list of
+    ciphertexts, or raises ValueError with the reason it was rejected.
+    """
+    if election.get('ballot_mode') == 'packed':
+        # One ciphertext holding a single candidate's slot
+        allowed = [1 << (index * election['slot_bits']) for index in range(len(candidates))]
+        one_hot = False
+        expected = 1
+    else:
+        allowed = [0, 1]
+        one_hot = True
+        expected = len(candidates)
+
+    if len(encrypted_vote) != expected:
+        raise ValueError(f"Encrypted vote must have {expected} ciphertexts.")
+
+    with crypto_timer('verify_proof', len(encrypted_vote)):
+        ok, error = ballot_verifier.verify(public_key.n, {
+            'ciphertexts': encrypted_vote,
+            'proof': proof,
+            'allowed': allowed,
+            'context': ballot_context(election['election_id'], voter_id),
+            'one_hot': one_hot
+        }, timeout=BALLOT_VERIFY_TIMEOUT)
+    if not ok:
+        raise ValueError(error)
+
+    return [int(ciphertext) for ciphertext in encrypted_vote]
 
 @app.route("/api/election/castVote", methods=["POST"])
 def cast_vote():
@@ -696,18 +1560,49 @@ def cast_vote():
     voter_id = data.get("voterId")
     election_id = data.get("electionId")
     vote_vector = data.get("voteVector")
+    # Ballots encrypted by the voter come as ciphertexts plus their proofs
+    encrypted_vote = data.get("encryptedVote")
+    proof = data.get("proof")
 
-    if not voter_id or not election_id or not vote_vector:
+    if not voter_id or not election_id or not (vote_vector or encrypted_vote):
         return jsonify({"status": "error", "message": "Invalid input data."}), 400
+
+    if encrypted_vote is not None:
+        if not isinstance(encrypted_vote, list) or not encrypted_vote or not isinstance(proof, dict):
+            return jsonify({"status": "error", "message": "An encrypted vote needs its ciphertexts and proof."}), 400
+    # Only one-hot ballots can be added up homomorphically
+    elif not is_valid_vote_vector(vote_vector):
+        return jsonify({"status": "error", "message": "Vote vector must select exactly one candidate."}), 400
     
-    # Fetch the public key from the Voter table
-    voter_response = supabase.table('Voter').select('public_key').eq('voter_id', voter_id).single().execute()
+    # Fetch the ballot encoding of the election, the voter and the candidates at the same time
+    election, voter_response, candidates = lookups.gather(
+        lambda: fetch_election(election_id),
+        lambda: supabase.table('Voter').select('election_id', 'public_key').eq('voter_id', voter_id).execute(),
+        lambda: fetch_candidates(election_id)
+    )
+    if not election:
+        return jsonify({"status": "error", "message": "Election not found."}), 404
+
+    # Results are snapshotted once the election closes, no ballot may change them
+    if election_closed(election):
+        return jsonify({"status": "error", "message": "Election has ended."}), 403
+
+    # One entry per candidate, anything past the last one would be counted for
+    # nobody. Packed ballots too: slots between the candidate count and
+    # max_candidates are never decoded.
+    if encrypted_vote is None and not is_valid_vote_vector(vote_vector, len(candidates)):
+        return jsonify({"status": "error", "message": "Vote vector must have one entry per candidate."}), 400
+
+    # Check the voter is registered for this election
     if not voter_response.data:
         return jsonify({"status": "error", "message": "Voter not found."}), 404
 
+    voter_election = fetch_voter_election(voter_response.data[0])
+    if not voter_election or str(voter_election['election_id']) != str(election_id):
+        return jsonify({"status": "error", "message": "Voter is not registered for this election."}), 403
+
     # Extract the public key data
-    public_key_data =  json.loads(voter_response.data.get('public_key'))
-    print(public_key_data)
+    public_key_data =  json.loads(election['public_key'])
     if not public_key_data:
         return jsonify({"status": "error", "message": "Invalid public key data."}), 500
 
@@ -719,27 +1614,77 @@ def cast_vote():
     except ValueError:
         return jsonify({"status": "error", "message": "Failed to load public key."}), 500
 
-    # Encrypt each element in the vote vector
-    try:
-        encrypted_vote_vector = [public_key.encrypt(vote) for vote in vote_vector]
-        encrypted_vote_vector_serialized = [str(vote.ciphertext()) for vote in encrypted_vote_vector]
-    except Exception as e:
-        return jsonify({"status": "error", "message": f"Encryption error: {str(e)}"}), 500
+    # Reserve the voter's single ballot before doing any crypto. Every
+    # failure below releases it again.
+    if not voted_index.claim(election_id, voter_id, confirm=lambda: find_vote(voter_id, election_id) is not None):
+        return jsonify({"status": "error", "message": "Voter has already cast a vote in this election."}), 403
+
+    # A client-encrypted ballot only has its proofs checked
+    if encrypted_vote is not None:
+        try:
+            ciphertexts = verify_client_ballot(election, candidates, voter_id, public_key, encrypted_vote, proof)
+        except ValueError as e:
+            voted_index.release(election_id, voter_id)
+            return jsonify({"status": "error", "message": f"Invalid encrypted vote: {str(e)}"}), 400
+        except Exception as e:
+            voted_index.release(election_id, voter_id)
+            return jsonify({"status": "error", "message": f"Could not verify the encrypted vote: {str(e)}"}), 503
+        encrypted_vote_vector_serialized = encode_ciphertexts(ciphertexts, ciphertext_width(public_key))
+
+    # Otherwise encrypt each element in the vote vector with precomputed obfuscation factors
+    else:
+        try:
+            obfuscator_pool = obfuscator_pools.get_pool(election_id, public_key, election_encryption_base(election))
+            with crypto_timer('encrypt', 1 if election.get('ballot_mode') == 'packed' else len(vote_vector)):
+                if election.get('ballot_mode') == 'packed':
+                    # The whole vector as a single ciphertext
+                    ciphertexts = [obfuscator_pool.encrypt(pack_vote_vector(vote_vector, election['slot_bits']))]
+                else:
+                    ciphertexts = [obfuscator_pool.encrypt(vote) for vote in vote_vector]
+            encrypted_vote_vector_serialized = encode_ciphertexts(ciphertexts, ciphertext_width(public_key))
+        except Exception as e:
+            voted_index.release(election_id, voter_id)
+            return jsonify({"status": "error", "message": f"Encryption error: {str(e)}"}), 500
 
     # Generate unique vote ID and random value for this vote entry
     vote_id = str(uuid.uuid4())
     random_value = str(random.randint(100000, 999999))
 
-    # Insert the encrypted vote into the Votes table
-    response = supabase.table('Votes').insert([{
+    vote_row = {
         "vote_id": vote_id,
         "voter_id": voter_id,
         "election_id": election_id,
         "encrypted_vote": encrypted_vote_vector_serialized,
         "random_value": random_value,
         "created_at": datetime.now().isoformat()
-    }]).execute()
-    print(response)
+    }
+
+    if BALLOT_INGEST_MODE == 'journal':
+        # The background writer inserts it and folds it into the tally
+        try:
+            ballot_journal.append(vote_row)
+        except Exception as e:
+            voted_index.release(election_id, voter_id)
+            return jsonify({"status": "error", "message": f"Failed to record vote: {str(e)}"}), 500
+    else:
+        # Insert the encrypted vote into the Votes table
+        try:
+            supabase.table('Votes').insert([vote_row]).execute()
+        except Exception as e:
+            voted_index.release(election_id, voter_id)
+            # Another server process may have stored a ballot for this voter first
+            if find_vote(voter_id, election_id):
+                return jsonify({"status": "error", "message": "Voter has already cast a vote in this election."}), 403
+            return jsonify({"status": "error", "message": f"Failed to record vote: {str(e)}"}), 500
+
+        # Fold the ballot into the running tally; if it is missing or this fails the results path rebuilds it
+        try:
+            update_election_tally(election_id, public_key, ciphertexts)
+        except Exception as e:
+            print(f"Error updating election tally: {str(e)}")
+
+    turnout.record(election_id)
+
     # Return a response
     return jsonify({
         "status": "success",
@@ -750,6 +1695,58 @@ def cast_vote():
         "election_id": election_id
     })
 
+@app.route('/api/admin/obfuscator-pools', methods=['GET'])
+def get_obfuscator_pools():
+    # Pool depth and hit/miss counters per election, for sizing the pools
+    return jsonify({'pools': obfuscator_pools.stats()}), 200
+
+@app.route('/api/admin/ballot-queue', methods=['GET'])
+def get_ballot_queue():
+    # Ballots acknowledged but not yet in Votes, and writer throughput
+    return jsonify({'mode': BALLOT_INGEST_MODE, **ballot_journal.stats()}), 200
+
+@app.route('/api/admin/crypto', methods=['GET'])
+def get_crypto_pool():
+    # Queue depth and outcomes of the crypto worker pool, for sizing CRYPTO_WORKERS
+    return jsonify(crypto.stats()), 200
+
+@app.route('/api/admin/ballot-verifier', methods=['GET'])
+def get_ballot_verifier():
+    # Batches of client-encrypted ballots whose proofs were checked
+    return jsonify({'client_encryption': CLIENT_ENCRYPTION, **ballot_verifier.stats()}), 200
+
+@app.route('/api/admin/voted-index', methods=['GET'])
+def get_voted_index():
+    return jsonify(voted_index.stats()), 200
+
+@app.route('/api/admin/results-cache', methods=['GET'])
+def get_results_cache():
+    return jsonify({**results_cache.stats(), 'scheduler': results_scheduler.stats()}), 200
+
+@app.route('/api/admin/results-cache/<election_id>', methods=['DELETE'])
+def invalidate_results_cache(election_id):
+    # Recompute the results of a closed election, e.g. after fixing its tally
+    try:
+        invalidate_results_snapshot(election_id)
+        return jsonify({'message': 'Results snapshot dropped'}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/admin/turnout', methods=['GET'])
+def get_turnout_streams():
+    return jsonify(turnout.stats()), 200
+
+@app.route('/api/admin/key-cache', methods=['GET'])
+def get_key_cache():
+    return jsonify(private_key_cache.stats()), 200
+
+@app.route('/api/admin/key-cache/<election_id>', methods=['DELETE'])
+def evict_key_cache(election_id):
+    # Drop a cached private key, e.g. once an audit is finished
+    if private_key_cache.evict(election_id):
+        return jsonify({'message': 'Key evicted'}), 200
+    return jsonify({'error': 'Key not cached'}), 404
+
 @app.route('/api/vote/receipt/<voter_id>', methods=['GET'])
 def vote_receipt(voter_id):
     try:
@@ -759,24 +1756,20 @@ def vote_receipt(voter_id):
         if not voter_data:
             return jsonify({'error': 'Voter not found'}), 404
 
-        voter_public_key = voter_data[0].get('public_key')
+        election_info = fetch_voter_election(voter_data[0])
 
-        election_result = supabase.table('Election').select('election_id',"created_at").eq('public_key', voter_public_key).execute()
-        election_data = election_result.data
-
-        if not election_data:
+        if not election_info:
             return jsonify({'error': 'Election not found'}), 404
         
-        election_info = election_data[0]
         election_id = election_info.get('election_id')
         created_at = election_info.get('created_at')
 
         # Check if the voter has already voted in this election
-        existing_vote = supabase.table('Votes').select('*').eq('voter_id', voter_id).eq('election_id', election_id).execute()
+        existing_vote = find_vote(voter_id, election_id)
 
-        if not existing_vote.data:
+        if not existing_vote:
             return jsonify({"status": "error", "message": "No vote is present"}), 403
-        encrypted_vote = existing_vote.data[0]['encrypted_vote']
+        encrypted_vote = existing_vote['encrypted_vote']
 
         # You could choose to display a truncated version for user interface purposes
         # For example, displaying the first 10 and last 10 characters
@@ -784,7 +1777,7 @@ def vote_receipt(voter_id):
         # Return candidates along with election start and end times
         return jsonify({
             'success': True,
-            'vote_id': existing_vote.data[0]['vote_id'],
+            'vote_id': existing_vote['vote_id'],
             'voter_id': voter_id,
             'name': voter_data[0]['name'],
             'voted_for': truncated_vote,
@@ -798,9 +1791,6 @@ def vote_receipt(voter_id):
 @app.route('/api/vote/decrypt', methods=['POST'])
 def decrypt_vote():
     try:
-        # Log incoming request
-        print("Received decrypt request")
-        
         # Get and validate request data
         data = request.get_json()
         if not data:
@@ -809,96 +1799,229 @@ def decrypt_vote():
         encrypted_vote = data.get('encrypted_vote')
         election_id = data.get('election_id')
         
-        # Log request data
-        print(f"Election ID: {election_id}")
-        print(f"Encrypted vote: {encrypted_vote}")
-        
         if not encrypted_vote or not election_id:
             return jsonify({'error': 'Missing required parameters'}), 400
             
-        # Parse the encrypted vote if it's a string
-        if isinstance(encrypted_vote, str):
-            try:
-                encrypted_vote = json.loads(encrypted_vote)
-            except json.JSONDecodeError as e:
-                return jsonify({'error': f'Invalid encrypted vote format: {str(e)}'}), 400
+        # Parse the encrypted vote, binary receipts and legacy JSON lists are both accepted
+        try:
+            encrypted_vote = load_encrypted_vote(encrypted_vote)
+        except Exception as e:
+            return jsonify({'error': f'Invalid encrypted vote format: {str(e)}'}), 400
             
         # Get election public key
-        election_result = supabase.table('Election')\
-            .select('public_key')\
-            .eq('election_id', election_id)\
-            .execute()
+        election = fetch_election(election_id)
             
-        if not election_result.data:
+        if not election:
             return jsonify({'error': 'Election not found'}), 404
             
         # Parse the public key
         try:
-            public_key_data = json.loads(election_result.data[0]['public_key'])
+            public_key_data = json.loads(election['public_key'])
             public_key = paillier.PaillierPublicKey(int(public_key_data['n']))
         except Exception as e:
             print(f"Error parsing public key: {str(e)}")
             return jsonify({'error': 'Invalid public key format'}), 500
         
-        # Get and parse the private key
-        try:
-            private_key_data = json.loads(retrieve_private_key(election_id).decode())
-            private_key = paillier.PaillierPrivateKey(
-                public_key,
-                int(private_key_data['p']),
-                int(private_key_data['q'])
-            )
-        except Exception as e:
-            print(f"Error retrieving/parsing private key: {str(e)}")
-            return jsonify({'error': 'Error accessing private key'}), 500
-        
         # Reconstruct EncryptedNumber objects
         try:
             encrypted_numbers = [
-                paillier.EncryptedNumber(public_key, int(num))
-                for num in encrypted_vote
+                paillier.EncryptedNumber(public_key, ciphertext)
+                for ciphertext in encrypted_vote
             ]
         except Exception as e:
             print(f"Error reconstructing encrypted numbers: {str(e)}")
             return jsonify({'error': 'Invalid encrypted vote data'}), 400
         
-        # Decrypt each number in the vector
+        # Get the (cached) private key and decrypt each number in the vector
         try:
-            decrypted_vote_vector = [
-                private_key.decrypt(encrypted_num)
-                for encrypted_num in encrypted_numbers
-            ]
+            with private_key_cache.lease(election_id, lambda: load_private_key(election_id, public_key)) as private_key:
+                try:
+                    with crypto_timer('decrypt', len(encrypted_numbers)):
+                        decrypted_vote_vector = crypto.run(
+                            'decrypt', decrypt_ciphertexts, public_key.n, private_key.p, private_key.q, encrypted_vote
+                        )
+                except CryptoUnavailable:
+                    raise
+                except Exception as e:
+                    print(f"Error decrypting vote vector: {str(e)}")
+                    return jsonify({'error': 'Failed to decrypt vote'}), 500
+        except CryptoUnavailable:
+            raise
         except Exception as e:
-            print(f"Error decrypting vote vector: {str(e)}")
-            return jsonify({'error': 'Failed to decrypt vote'}), 500
+            print(f"Error retrieving/parsing private key: {str(e)}")
+            return jsonify({'error': 'Error accessing private key'}), 500
         
         # Get candidates
-        candidates_result = supabase.table('Candidate')\
-            .select('*')\
-            .eq('election_id', election_id)\
-            .execute()
-            
-        candidates = candidates_result.data
-        
-        # Find the selected candidate
-        selected_index = decrypted_vote_vector.index(max(decrypted_vote_vector))
-        selected_candidate = candidates[selected_index] if selected_index < len(candidates) else None
+        candidates = fetch_candidates(election_id)
+        decrypted_vote_vector, selected_candidate = read_decrypted_vote(election, candidates, decrypted_vote_vector)
         
         # Prepare and return response
         response_data = {
             'success': True,
             'decrypted_vector': decrypted_vote_vector,
-            'selected_candidate': {
-                'name': selected_candidate['name'],
-                'party': selected_candidate['party_name']
-            } if selected_candidate else None
+            'selected_candidate': selected_candidate
         }
         
         return jsonify(response_data)
         
+    except CryptoUnavailable:
+        raise
     except Exception as e:
         print(f"Unexpected error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def read_decrypted_vote(election, candidates, decrypted_vote_vector):
+    """
+    Return (vote vector, selected candidate) for a decrypted ballot.
+    A packed ballot decrypts to one number holding every slot.
+    """
+    if election.get('ballot_mode') == 'packed':
+        decrypted_vote_vector = unpack_counts(decrypted_vote_vector[0], election['slot_bits'], len(candidates))
+
+    selected_index = decrypted_vote_vector.index(max(decrypted_vote_vector))
+    selected_candidate = candidates[selected_index] if selected_index < len(candidates) else None
+    return decrypted_vote_vector, {
+        'name': selected_candidate['name'],
+        'party': selected_candidate['party_name']
+    } if selected_candidate else None
+
+# Batch receipt verification
+VERIFY_BATCH_MAX = int(config.get('VERIFY_BATCH_MAX') or 10000)
+VERIFY_SHARD_SIZE = int(config.get('VERIFY_SHARD_SIZE') or 50)
+
+def iter_verify_shards(election_id, vote_ids, encrypted_votes):
+    """
+    Yield the ballots to verify in shards of VERIFY_SHARD_SIZE items, each
+    {'index', 'vote_id', 'encrypted_vote'} or {'index', 'vote_id', 'error'}
+    when the vote is not found. vote_ids are looked up one shard at a time.
+    """
+    index = 0
+    for start in range(0, len(vote_ids), VERIFY_SHARD_SIZE):
+        chunk = [str(vote_id) for vote_id in vote_ids[start:start + VERIFY_SHARD_SIZE]]
+        rows = supabase.table('Votes')\
+            .select('vote_id', 'encrypted_vote')\
+            .eq('election_id', election_id)\
+            .in_('vote_id', chunk)\
+            .execute().data
+        found = {str(row['vote_id']): row['encrypted_vote'] for row in rows}
+
+        items = []
+        for vote_id in chunk:
+            encrypted_vote = found.get(vote_id)
+            if encrypted_vote is None and BALLOT_INGEST_MODE == 'journal':
+                pending = ballot_journal.find(vote_id=vote_id, election_id=election_id)
+                encrypted_vote = pending['encrypted_vote'] if pending else None
+
+            if encrypted_vote is None:
+                items.append({'index': index, 'vote_id': vote_id, 'error': 'Vote not found in this election'})
+            else:
+                items.append({'index': index, 'vote_id': vote_id, 'encrypted_vote': encrypted_vote})
+            index += 1
+        yield items
+
+    for start in range(0, len(encrypted_votes), VERIFY_SHARD_SIZE):
+        items = []
+        for encrypted_vote in encrypted_votes[start:start + VERIFY_SHARD_SIZE]:
+            items.append({'index': index, 'vote_id': None, 'encrypted_vote': encrypted_vote})
+            index += 1
+        yield items
+
+@app.route('/api/vote/decrypt/batch', methods=['POST'])
+def decrypt_votes_batch():
+    """
+    Decrypt many ballots of one election in a single call, for audits.
+    Takes vote_ids and/or encrypted_votes and streams one NDJSON line per
+    ballot in request order, then a done line. The private key and the
+    candidates are loaded once and the decryption runs on the tally workers.
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'No request data provided'}), 400
+
+    election_id = data.get('election_id')
+    vote_ids = data.get('vote_ids') or []
+    encrypted_votes = data.get('encrypted_votes') or []
+
+    if not election_id or not isinstance(vote_ids, list) or not isinstance(encrypted_votes, list):
+        return jsonify({'error': 'Missing required parameters'}), 400
+    if not vote_ids and not encrypted_votes:
+        return jsonify({'error': 'Provide vote_ids or encrypted_votes'}), 400
+    if len(vote_ids) + len(encrypted_votes) > VERIFY_BATCH_MAX:
+        return jsonify({'error': f'At most {VERIFY_BATCH_MAX} ballots per request'}), 400
+
+    election, candidates = lookups.gather(
+        lambda: fetch_election(election_id),
+        lambda: fetch_candidates(election_id)
+    )
+    if not election:
+        return jsonify({'error': 'Election not found'}), 404
+
+    try:
+        public_key = paillier.PaillierPublicKey(int(json.loads(election['public_key'])['n']))
+    except Exception as e:
+        print(f"Error parsing public key: {str(e)}")
+        return jsonify({'error': 'Invalid public key format'}), 500
+
+    # Load the key up front so a missing key is still a plain error response
+    def load():
+        return load_private_key(election_id, public_key)
+    try:
+        with private_key_cache.lease(election_id, load):
+            pass
+    except Exception as e:
+        print(f"Error retrieving/parsing private key: {str(e)}")
+        return jsonify({'error': 'Error accessing private key'}), 500
+
+    def stream():
+        started = time.perf_counter()
+        verified = failed = 0
+        # Shards in flight on the workers, their items are matched up in order
+        queued = deque()
+
+        def ballots():
+            for items in iter_verify_shards(election_id, vote_ids, encrypted_votes):
+                queued.append(items)
+                yield [item['encrypted_vote'] for item in items if 'error' not in item]
+
+        try:
+            with private_key_cache.lease(election_id, load) as private_key:
+                for results, seconds in tally_engine.decrypt(public_key, private_key, ballots()):
+                    crypto_seconds.observe(seconds, operation='decrypt_batch')
+                    crypto_operations.inc(len(results), operation='decrypt_batch')
+
+                    decrypted = iter(results)
+                    for item in queued.popleft():
+                        line = {'event': 'ballot', 'index': item['index'], 'vote_id': item['vote_id']}
+                        error = item.get('error')
+                        if error is None:
+                            vote_vector, error = next(decrypted)
+                        if error is None:
+                            try:
+                                line['decrypted_vector'], line['selected_candidate'] = read_decrypted_vote(
+                                    election, candidates, vote_vector
+                                )
+                            except Exception as e:
+                                error = str(e)
+
+                        if error is None:
+                            verified += 1
+                        else:
+                            line['error'] = error
+                            failed += 1
+                        yield json.dumps(line) + '\n'
+        except Exception as e:
+            print(f"Error verifying ballots: {str(e)}")
+            yield json.dumps({'event': 'error', 'error': str(e), 'verified': verified, 'failed': failed}) + '\n'
+            return
+
+        yield json.dumps({
+            'event': 'done',
+            'verified': verified,
+            'failed': failed,
+            'seconds': round(time.perf_counter() - started, 3)
+        }) + '\n'
+
+    return Response(stream_with_context(stream()), mimetype='application/x-ndjson')
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,55 @@
+# ballot_codec.py
+from base64 import b64encode, b64decode
+import json
+
+# Binary ballot layout, base64 encoded in the row:
+#   1 byte   format version
+#   2 bytes  width of each ciphertext in bytes (big-endian)
+#   N bytes  ciphertexts, each a fixed-width big-endian integer
+BALLOT_FORMAT_VERSION = 1
+HEADER_SIZE = 3
+
+
+def ciphertext_width(public_key):
+    """Bytes needed for any ciphertext under this key (it is below n^2)."""
+    return (public_key.nsquare.bit_length() + 7) // 8
+
+
+def encode_ciphertexts(ciphertexts, width):
+    """
+    Encode raw ciphertext integers into the versioned binary format.
+    """
+    header = bytes([BALLOT_FORMAT_VERSION]) + width.to_bytes(2, 'big')
+    body = b''.join(ciphertext.to_bytes(width, 'big') for ciphertext in ciphertexts)
+    return b64encode(header + body).decode('ascii')
+
+
+def is_legacy_encoding(value):
+    """Old rows are JSON lists of decimal strings."""
+    return isinstance(value, list) or value.lstrip().startswith('[')
+
+
+def decode_ciphertexts(value):
+    """
+    Decode a stored ballot or tally into a list of ciphertext integers.
+    Accepts both the binary format and legacy JSON lists.
+    """
+    if is_legacy_encoding(value):
+        if isinstance(value, str):
+            value = json.loads(value)
+        return [int(num) for num in value]
+
+    data = b64decode(value)
+    if not data or data[0] != BALLOT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported ballot format version {data[0] if data else None}")
+
+    width = int.from_bytes(data[1:HEADER_SIZE], 'big')
+    body = memoryview(data)[HEADER_SIZE:]
+    if width == 0 or len(body) % width:
+        raise ValueError("Corrupt ballot encoding")
+
+    # Slicing the memoryview reads each ciphertext without copying the bytes
+    return [
+        int.from_bytes(body[offset:offset + width], 'big')
+        for offset in range(0, len(body), width)
+    ]
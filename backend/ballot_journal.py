@@ -0,0 +1,287 @@
+# ballot_journal.py
+from collections import OrderedDict
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+class JournalLocked(Exception):
+    """Raised when another process already writes to the same journal."""
+
+
+class BallotJournal:
+    """
+    Group-commit queue for cast ballots.
+
+    append() writes the Votes row to a local append-only journal and fsyncs
+    it, so the ballot survives a crash once the voter has a receipt. A
+    background thread drains the queue into the database in batches of up to
+    batch_size rows, waiting at most linger seconds for a batch to fill.
+
+    `write(rows)` must be idempotent on vote_id and return the rows it
+    actually inserted; `on_committed(rows)` is then called with those, so a
+    ballot replayed after a crash is never counted twice. The journal records
+    a commit marker per batch, and on start every ballot without one is
+    queued again.
+
+    A batch that fails max_batch_failures times in a row is written one row
+    at a time. A row whose error `is_rejected(error)` calls permanent (a
+    constraint violation, say) goes to the dead-letter file next to the
+    journal and to `on_rejected(rows)`, and is marked committed so a replay
+    does not bring it back. Any other error stops the pass, and the rows not
+    written yet are retried later as before.
+
+    One journal belongs to one process. start() takes an exclusive lock on
+    path + '.lock' and raises JournalLocked if another process holds it, so
+    every worker process needs its own BALLOT_JOURNAL_PATH.
+    """
+
+    def __init__(self, path, write, on_committed=None, batch_size=100, linger=0.05,
+                 compact_bytes=16 * 1024 * 1024, max_batch_failures=3,
+                 is_rejected=None, on_rejected=None):
+        self.path = path
+        self.dead_letter_path = path + '.rejected'
+        self.write = write
+        self.on_committed = on_committed
+        self.max_batch_failures = max_batch_failures
+        self.is_rejected = is_rejected or (lambda error: False)
+        self.on_rejected = on_rejected
+        self.batch_size = batch_size
+        self.linger = linger
+        self.compact_bytes = compact_bytes
+        self.appended = 0
+        self.committed = 0
+        self.batches = 0
+        self.failures = 0
+        self.rejected = 0
+        self.last_batch_seconds = 0.0
+        self._pending = OrderedDict()
+        self._enqueued_at = {}
+        self._in_flight = 0
+        self._file = None
+        self._lock_file = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+
+    def start(self):
+        """Replay uncommitted ballots from the journal and start the writer."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._acquire_path()
+            replayed = self._replay()
+            self._rewrite(list(self._pending.values()))
+            self._thread = threading.Thread(target=self._write_loop, name='ballot-journal', daemon=True)
+            self._thread.start()
+        if replayed:
+            print(f"Replaying {replayed} uncommitted ballots from {self.path}")
+
+    def _acquire_path(self):
+        # Caller holds the lock. Two processes appending to one journal would
+        # replay and commit each other's ballots.
+        lock_file = open(self.path + '.lock', 'a+')
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            lock_file.close()
+            raise JournalLocked(
+                f"Ballot journal {self.path} is in use by another process, "
+                f"give every worker process its own BALLOT_JOURNAL_PATH"
+            )
+        self._lock_file = lock_file
+
+    def _replay(self):
+        # Caller holds the lock
+        if not os.path.exists(self.path):
+            return 0
+
+        with open(self.path, 'r', encoding='utf-8') as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-append, it was never acknowledged
+                    continue
+                if record['op'] == 'ballot':
+                    self._pending[record['row']['vote_id']] = record['row']
+                elif record['op'] == 'commit':
+                    for vote_id in record['vote_ids']:
+                        self._pending.pop(vote_id, None)
+
+        now = time.monotonic()
+        self._enqueued_at = {vote_id: now for vote_id in self._pending}
+        return len(self._pending)
+
+    def _rewrite(self, rows):
+        # Caller holds the lock. Swap in a journal holding only the pending ballots.
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as journal:
+            for row in rows:
+                journal.write(json.dumps({'op': 'ballot', 'row': row}) + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(temp_path, self.path)
+
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _log(self, record):
+        # Caller holds the lock
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def append(self, row):
+        """Durably queue one Votes row. Returns once it is on disk."""
+        self.start()
+        with self._lock:
+            self._log({'op': 'ballot', 'row': row})
+            self._pending[row['vote_id']] = row
+            self._enqueued_at[row['vote_id']] = time.monotonic()
+            self.appended += 1
+            self._not_empty.notify()
+
+    def find_all(self, **filters):
+        """Ballots still waiting for the database that match all filters."""
+        with self._lock:
+            return [
+                dict(row) for row in self._pending.values()
+                if all(str(row.get(column)) == str(value) for column, value in filters.items())
+            ]
+
+    def find(self, **filters):
+        """A ballot still waiting for the database that matches all filters, or None."""
+        rows = self.find_all(**filters)
+        return rows[0] if rows else None
+
+    def _next_batch(self):
+        with self._lock:
+            while not self._pending:
+                self._not_empty.wait()
+
+            # Give the batch up to `linger` seconds from its oldest ballot to fill
+            deadline = self._enqueued_at[next(iter(self._pending))] + self.linger
+            while len(self._pending) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._not_empty.wait(remaining)
+
+            batch = list(self._pending.values())[:self.batch_size]
+            self._in_flight = len(batch)
+            return batch
+
+    def _write_loop(self):
+        delay = self.linger
+        failures = 0
+        while True:
+            batch = self._next_batch()
+            started = time.monotonic()
+            try:
+                if failures >= self.max_batch_failures:
+                    # The batch keeps failing, find the rows that cannot be written
+                    self._write_rows(batch, started)
+                else:
+                    self._commit(batch, self.write(batch), [], started)
+            except Exception as e:
+                # Keep the batch queued and back off, the journal still holds it
+                self.failures += 1
+                failures += 1
+                print(f"Error writing ballot batch: {str(e)}")
+                time.sleep(delay)
+                delay = min(delay * 2 or 0.1, 5)
+                continue
+            delay = self.linger
+            failures = 0
+
+    def _write_rows(self, batch, started):
+        """
+        Write a batch row by row, setting aside rows that are rejected for
+        good. On any other error the rows done so far are committed and the
+        error is raised for the rest.
+        """
+        done, inserted, rejected = [], [], []
+        try:
+            for row in batch:
+                try:
+                    inserted.extend(self.write([row]))
+                except Exception as e:
+                    if not self.is_rejected(e):
+                        raise
+                    rejected.append((row, str(e)))
+                done.append(row)
+        finally:
+            if done:
+                self._commit(done, inserted, rejected, started)
+
+    def _commit(self, batch, inserted, rejected, started):
+        if rejected:
+            self._dead_letter(rejected)
+
+        if self.on_committed is not None and inserted:
+            try:
+                self.on_committed(inserted)
+            except Exception as e:
+                print(f"Error after committing ballot batch: {str(e)}")
+
+        with self._lock:
+            self._log({'op': 'commit', 'vote_ids': [row['vote_id'] for row in batch]})
+            for row in batch:
+                self._pending.pop(row['vote_id'], None)
+                self._enqueued_at.pop(row['vote_id'], None)
+            self._in_flight = 0
+            self.committed += len(batch) - len(rejected)
+            self.rejected += len(rejected)
+            self.batches += 1
+            self.last_batch_seconds = time.monotonic() - started
+
+            if self._file.tell() > self.compact_bytes:
+                self._rewrite(list(self._pending.values()))
+
+        # Only once they are out of the queue, find() no longer sees them
+        if rejected and self.on_rejected is not None:
+            try:
+                self.on_rejected([row for row, error in rejected])
+            except Exception as e:
+                print(f"Error handling rejected ballots: {str(e)}")
+
+    def _dead_letter(self, rejected):
+        # Kept before the commit marker, a crash in between only replays them
+        with open(self.dead_letter_path, 'a', encoding='utf-8') as dead_letters:
+            for row, error in rejected:
+                dead_letters.write(json.dumps({'op': 'rejected', 'row': row, 'error': error}) + '\n')
+            dead_letters.flush()
+            os.fsync(dead_letters.fileno())
+
+        for row, error in rejected:
+            print(f"Ballot {row['vote_id']} rejected by the database: {error}")
+
+    def stats(self):
+        with self._lock:
+            oldest = next(iter(self._pending), None)
+            return {
+                'depth': len(self._pending),
+                'in_flight': self._in_flight,
+                'oldest_pending_seconds': round(time.monotonic() - self._enqueued_at[oldest], 3) if oldest else 0,
+                'appended': self.appended,
+                'committed': self.committed,
+                'batches': self.batches,
+                'failures': self.failures,
+                'rejected': self.rejected,
+                'last_batch_seconds': round(self.last_batch_seconds, 4),
+                'batch_size': self.batch_size,
+                'linger': self.linger
+            }
@@ -0,0 +1,367 @@
+# ballot_proofs.py
+#
+# Zero-knowledge proofs that a client-encrypted Paillier ballot is well
+# formed, so the browser can encrypt its own vote and the server only has
+# to check it.
+#
+# Every ciphertext c comes with a proof that it encrypts one of an allowed
+# set of plaintexts: {0, 1} per slot of a vector ballot, or one candidate's
+# packed slot value for a packed ballot. A vector ballot also proves that
+# the product of its ciphertexts encrypts 1, i.e. exactly one slot is set.
+#
+# Both are built from the Sigma protocol for "u is an n-th residue mod n^2"
+# (c encrypts m iff c / g^m = r^n): commitment a = rho^n, challenge e,
+# response z = rho * r^e mod n, checked as z^n == a * u^e (mod n^2). The
+# set membership proof OR-composes one run per allowed plaintext, and the
+# challenge comes from hashing the statement (Fiat-Shamir), bound to the
+# election and voter so a proof cannot be replayed for another voter.
+#
+# vite-project/src/utils/ballotCrypto.js is the prover in the browser; encrypt_ballot()
+# below is the same prover for Python callers and the benchmarks.
+from collections import deque
+from concurrent.futures import Future
+import hashlib
+import math
+import secrets
+import threading
+import time
+
+CHALLENGE_BITS = 128
+# Random exponents of the batch check, a bad equation slips through with probability 2^-64
+BATCH_EXPONENT_BITS = 64
+
+
+def ballot_context(election_id, voter_id):
+    return f"{election_id}:{voter_id}"
+
+
+def challenge(context, n, ciphertext, commitments):
+    """Fiat-Shamir challenge, the same string is hashed by the browser."""
+    message = '|'.join([context, str(n), str(ciphertext)] + [str(a) for a in commitments])
+    digest = hashlib.sha256(message.encode('utf-8')).digest()
+    return int.from_bytes(digest, 'big') % (1 << CHALLENGE_BITS)
+
+
+def divide_plaintext(n, nsquare, ciphertext, plaintext):
+    """c / g^m mod n^2, with g = n + 1 so g^-m = 1 - m*n."""
+    return ciphertext * (1 - plaintext * n) % nsquare
+
+
+def random_unit(n):
+    while True:
+        r = secrets.randbelow(n)
+        if r > 0 and math.gcd(r, n) == 1:
+            return r
+
+
+def prove_membership(n, ciphertext, r, allowed, index, context):
+    """
+    Prove ciphertext = g^allowed[index] * r^n without revealing index.
+    Returns {'a', 'e', 'z'} with one entry per allowed plaintext.
+    """
+    nsquare = n * n
+    commitments, challenges, responses = [], [], []
+    rho = random_unit(n)
+
+    for position, plaintext in enumerate(allowed):
+        if position == index:
+            commitments.append(pow(rho, n, nsquare))
+            challenges.append(0)
+            responses.append(0)
+            continue
+        # Simulate the branches that are not true
+        u = divide_plaintext(n, nsquare, ciphertext, plaintext)
+        e = secrets.randbits(CHALLENGE_BITS)
+        z = random_unit(n)
+        commitments.append(pow(z, n, nsquare) * pow(pow(u, e, nsquare), -1, nsquare) % nsquare)
+        challenges.append(e)
+        responses.append(z)
+
+    total = challenge(context, n, ciphertext, commitments)
+    challenges[index] = (total - sum(challenges)) % (1 << CHALLENGE_BITS)
+    responses[index] = rho * pow(r, challenges[index], n) % n
+
+    return {
+        'a': [str(a) for a in commitments],
+        'e': [str(e) for e in challenges],
+        'z': [str(z) for z in responses]
+    }
+
+
+def prove_sum(n, ciphertexts, randomness, context):
+    """Prove the product of the ciphertexts encrypts 1."""
+    nsquare = n * n
+    product = 1
+    for ciphertext in ciphertexts:
+        product = product * ciphertext % nsquare
+    u = divide_plaintext(n, nsquare, product, 1)
+
+    combined = 1
+    for r in randomness:
+        combined = combined * r % n
+
+    rho = random_unit(n)
+    a = pow(rho, n, nsquare)
+    e = challenge(context, n, u, [a])
+    return {'a': str(a), 'z': str(rho * pow(combined, e, n) % n)}
+
+
+def encrypt_ballot(n, plaintexts, allowed, context, one_hot):
+    """
+    Encrypt plaintexts (each one of allowed) and prove it.
+    Returns (ciphertexts, proof). one_hot adds the sum proof of a vector ballot.
+    """
+    nsquare = n * n
+    ciphertexts, randomness, slots = [], [], []
+    for slot, plaintext in enumerate(plaintexts):
+        r = random_unit(n)
+        ciphertext = (1 + plaintext * n) * pow(r, n, nsquare) % nsquare
+        slots.append(prove_membership(n, ciphertext, r, allowed, allowed.index(plaintext), f"{context}:{slot}"))
+        ciphertexts.append(ciphertext)
+        randomness.append(r)
+
+    proof = {'slots': slots}
+    if one_hot:
+        proof['sum'] = prove_sum(n, ciphertexts, randomness, f"{context}:sum")
+    return ciphertexts, proof
+
+
+def parse_element(value, bound):
+    """An integer in [1, bound) from a JSON number or decimal string."""
+    number = int(value)
+    if not 0 < number < bound:
+        raise ValueError("value out of range")
+    return number
+
+
+def ballot_equations(n, ciphertexts, proof, allowed, context, one_hot):
+    """
+    Check the proof's structure and challenges and return the equations
+    (z, a, bases, m, e) that remain to be checked, each meaning
+    z^n == a * u^e (mod n^2) with u = prod(bases) / g^m. Raises ValueError
+    when the proof is malformed.
+    """
+    nsquare = n * n
+    ciphertexts = [parse_element(c, nsquare) for c in ciphertexts]
+    if any(math.gcd(c, n) != 1 for c in ciphertexts):
+        raise ValueError("ciphertext is not invertible")
+
+    slots = proof.get('slots')
+    if not isinstance(slots, list) or len(slots) != len(ciphertexts):
+        raise ValueError("one proof per ciphertext is required")
+
+    equations = []
+    for slot, (ciphertext, entry) in enumerate(zip(ciphertexts, slots)):
+        commitments = [parse_element(a, nsquare) for a in entry['a']]
+        challenges = [int(e) for e in entry['e']]
+        responses = [parse_element(z, n) for z in entry['z']]
+        if not len(commitments) == len(challenges) == len(responses) == len(allowed):
+            raise ValueError("one proof branch per allowed value is required")
+        if any(not 0 <= e < (1 << CHALLENGE_BITS) for e in challenges):
+            raise ValueError("challenge out of range")
+        if sum(challenges) % (1 << CHALLENGE_BITS) != challenge(f"{context}:{slot}", n, ciphertext, commitments):
+            raise ValueError("challenges do not match the commitments")
+
+        for plaintext, a, e, z in zip(allowed, commitments, challenges, responses):
+            equations.append((z, a, (ciphertext,), plaintext, e))
+
+    if one_hot:
+        entry = proof.get('sum')
+        if not isinstance(entry, dict):
+            raise ValueError("the sum proof is missing")
+        product = 1
+        for ciphertext in ciphertexts:
+            product = product * ciphertext % nsquare
+        u = divide_plaintext(n, nsquare, product, 1)
+        a = parse_element(entry['a'], nsquare)
+        z = parse_element(entry['z'], n)
+        equations.append((z, a, tuple(ciphertexts), 1, challenge(f"{context}:sum", n, u, [a])))
+
+    return equations
+
+
+def multi_exponent(pairs, modulus):
+    """
+    prod(base^exponent) mod modulus with Pippenger's bucket method. The
+    squarings are shared by all bases, so a batch of short exponents costs
+    little more than one multiplication per base and window.
+    """
+    pairs = [(base, exponent) for base, exponent in pairs if exponent]
+    if not pairs:
+        return 1
+
+    bits = max(exponent.bit_length() for _, exponent in pairs)
+    window = max(2, min(12, len(pairs).bit_length() - 3))
+    mask = (1 << window) - 1
+
+    result = 1
+    for shift in range((bits - 1) // window * window, -1, -window):
+        for _ in range(window):
+            result = result * result % modulus
+
+        buckets = [1] * (mask + 1)
+        for base, exponent in pairs:
+            digit = (exponent >> shift) & mask
+            if digit:
+                buckets[digit] = buckets[digit] * base % modulus
+
+        # prod(bucket[j]^j) as a running product from the top bucket down
+        running = total = 1
+        for digit in range(mask, 0, -1):
+            if buckets[digit] != 1:
+                running = running * buckets[digit] % modulus
+            if running != 1:
+                total = total * running % modulus
+        result = result * total % modulus
+
+    return result
+
+
+def check_equations(n, equations):
+    """
+    Check many z^n == a * u^e equations at once with random small exponents
+    d: (prod z^d)^n == prod a^d * u^(e*d). One full-size exponentiation per
+    batch instead of one per equation.
+
+    u^k is never computed directly: u = prod(bases) / g^m, so u^k is
+    prod(bases^k) * (1 - m*k*n). The exponents of each ciphertext are
+    summed and the products done in two multi-exponentiations.
+    """
+    nsquare = n * n
+    left, commitments, exponents = [], [], {}
+    shift = 0
+    for z, a, bases, m, e in equations:
+        d = secrets.randbits(BATCH_EXPONENT_BITS) | 1
+        left.append((z, d))
+        commitments.append((a, d))
+        for base in bases:
+            exponents[base] = exponents.get(base, 0) + e * d
+        shift += m * e * d
+
+    right = multi_exponent(commitments + list(exponents.items()), nsquare) * (1 - shift * n) % nsquare
+    return pow(multi_exponent(left, nsquare), n, nsquare) == right
+
+
+def verify_ballot_batch(n, ballots):
+    """
+    Verify the proofs of several ballots for one public key. Runs inside a
+    worker process. Each ballot is a dict of ciphertexts, proof, allowed,
+    context and one_hot; returns an (ok, error) pair per ballot.
+    """
+    results = [None] * len(ballots)
+    equations = {}
+    for index, ballot in enumerate(ballots):
+        try:
+            equations[index] = ballot_equations(
+                n, ballot['ciphertexts'], ballot['proof'], ballot['allowed'],
+                ballot['context'], ballot['one_hot']
+            )
+        except (ValueError, TypeError, KeyError) as e:
+            results[index] = (False, f"Malformed ballot proof: {str(e)}")
+
+    # One check for the whole batch; only if it fails find the bad ballots
+    if check_equations(n, [equation for ballot in equations.values() for equation in ballot]):
+        for index in equations:
+            results[index] = (True, None)
+    else:
+        for index, ballot in equations.items():
+            results[index] = (True, None) if check_equations(n, ballot) else (False, "Invalid ballot proof")
+
+    return results
+
+
+class BatchVerifier:
+    """
+    Collects the client-encrypted ballots of concurrent cast_vote requests
+    and verifies their proofs together on a worker pool.
+
+    A batch closes at batch_size ballots or linger seconds after its oldest
+    ballot. `submit(fn, *args)` runs the work and returns a Future, so
+    several batches can be checked on different workers at once.
+    """
+
+    def __init__(self, submit, batch_size=64, linger=0.01):
+        self.submit = submit
+        self.batch_size = batch_size
+        self.linger = linger
+        self.ballots = 0
+        self.batches = 0
+        self.rejected = 0
+        self.largest_batch = 0
+        self._queue = deque()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+
+    def verify(self, n, ballot, timeout=None):
+        """Queue one ballot and wait for its (ok, error) result."""
+        future = Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._collect_loop, name='ballot-verifier', daemon=True)
+                self._thread.start()
+            self._queue.append((n, ballot, future, time.monotonic()))
+            self._not_empty.notify()
+        return future.result(timeout)
+
+    def _next_batch(self):
+        with self._lock:
+            while not self._queue:
+                self._not_empty.wait()
+
+            deadline = self._queue[0][3] + self.linger
+            while len(self._queue) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._not_empty.wait(remaining)
+
+            count = min(len(self._queue), self.batch_size)
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _collect_loop(self):
+        while True:
+            batch = self._next_batch()
+
+            # Ballots of different elections are checked against their own key
+            by_key = {}
+            for n, ballot, future, _ in batch:
+                by_key.setdefault(n, []).append((ballot, future))
+
+            for n, items in by_key.items():
+                with self._lock:
+                    self.batches += 1
+                    self.ballots += len(items)
+                    self.largest_batch = max(self.largest_batch, len(items))
+                try:
+                    work = self.submit(verify_ballot_batch, n, [ballot for ballot, _ in items])
+                except Exception as e:
+                    for _, future in items:
+                        future.set_exception(e)
+                    continue
+                work.add_done_callback(lambda work, items=items: self._resolve(items, work))
+
+    def _resolve(self, items, work):
+        try:
+            results = work.result()
+        except Exception as e:
+            for _, future in items:
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            self.rejected += sum(1 for ok, _ in results if not ok)
+        for (_, future), result in zip(items, results):
+            future.set_result(result)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': len(self._queue),
+                'ballots': self.ballots,
+                'batches': self.batches,
+                'rejected': self.rejected,
+                'largest_batch': self.largest_batch,
+                'batch_size': self.batch_size,
+                'linger': self.linger
+            }
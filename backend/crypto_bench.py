@@ -0,0 +1,256 @@
+# crypto_bench.py
+#
+# Micro-benchmarks for the expensive crypto in the backend: Paillier keygen,
+# ballot encryption (stock phe and the fixed-base engine, whose ciphertexts
+# are checked to decrypt identically), the proof check of client-encrypted ballots, the
+# homomorphic tally and its decryption, and the PBKDF2 + AES-GCM private
+# key storage.
+#
+#   python crypto_bench.py --output results.json
+#   python crypto_bench.py --baseline baseline.json              # compare
+#   python crypto_bench.py --baseline baseline.json --save-baseline
+#
+# Exits with status 1 when a case got slower than the baseline by more
+# than --tolerance.
+from datetime import datetime
+import json
+import os
+import platform
+import statistics
+import time
+import click
+import phe
+from keypool import generate_keypair
+from obfuscators import ObfuscatorPool, generate_obfuscators
+from tally import aggregate_shard, decrypt_tally
+from ballot_codec import encode_ciphertexts, ciphertext_width
+from key_storage import SecureKeyStorage
+from ballot_proofs import encrypt_ballot, verify_ballot_batch, ballot_context
+from fast_encrypt import FastEncryptor, generate_encryption_base
+
+# Tally benchmarks cycle through this many real ballots. Multiplying
+# ciphertexts costs the same whatever they encrypt, and encrypting 100k
+# distinct ballots would take longer than the benchmark itself.
+DISTINCT_BALLOTS = 64
+# Client-encrypted ballots checked per batch in the ballot_verify case
+VERIFY_BATCH = 16
+
+
+def measure(fn, repeats, operations=1):
+    """Time fn() repeats times. per_op is the median divided by operations."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    median = statistics.median(timings)
+    return {
+        'repeats': repeats,
+        'operations': operations,
+        'min': min(timings),
+        'median': median,
+        'mean': statistics.mean(timings),
+        'per_op': median / operations
+    }
+
+
+def case_name(name, **params):
+    return f"{name}[{','.join(f'{key}={value}' for key, value in params.items())}]"
+
+
+def one_hot(candidates, choice=0):
+    return [1 if index == choice else 0 for index in range(candidates)]
+
+
+def check_fast_decryption(public_key, private_key, encryptor, plaintexts):
+    """The fixed-base engine's ciphertexts must decrypt exactly like phe's."""
+    for plaintext in plaintexts:
+        fast = private_key.decrypt(phe.EncryptedNumber(public_key, encryptor.encrypt(plaintext)))
+        stock = private_key.decrypt(public_key.encrypt(plaintext))
+        if fast != plaintext or stock != plaintext:
+            raise click.ClickException(f"fast encryption decrypted {plaintext} as {fast}, phe as {stock}")
+
+
+def run_suite(key_bits, candidates, ballot_counts, repeats, report=print):
+    results = {}
+
+    def record(name, result, **params):
+        case = case_name(name, **params)
+        results[case] = result
+        report(f"{case:<55} median {result['median'] * 1000:10.3f} ms   per op {result['per_op'] * 1000:10.4f} ms")
+
+    # PBKDF2 dominates and does not depend on the key size, one set of cases is enough
+    storage = SecureKeyStorage(os.urandom(32).hex())
+    private_key_data = json.dumps({'p': str(2 ** 1023 + 1), 'q': str(2 ** 1023 + 3)}).encode('utf-8')
+    encrypted_key, _ = storage.encrypt_private_key(private_key_data)
+    record('key_storage_encrypt', measure(lambda: storage.encrypt_private_key(private_key_data), repeats))
+    record('key_storage_decrypt', measure(lambda: storage.decrypt_private_key(encrypted_key), repeats))
+
+    for bits in key_bits:
+        record('keygen', measure(lambda: generate_keypair(bits), repeats), key_bits=bits)
+        public_key, private_key = generate_keypair(bits)
+        width = ciphertext_width(public_key)
+
+        # Building the fixed-base table is a one-off cost per election and worker
+        base = generate_encryption_base(public_key.n)
+        record('fast_table', measure(lambda: FastEncryptor(public_key.n, base), repeats), key_bits=bits)
+        encryptor = FastEncryptor(public_key.n, base)
+        check_fast_decryption(public_key, private_key, encryptor, [0, 1, 7, 2 ** (bits // 2), public_key.max_int])
+
+        for count in candidates:
+            vote_vector = one_hot(count)
+
+            # The original cast_vote path, one full phe encryption per slot
+            record(
+                'encrypt_phe',
+                measure(lambda: [public_key.encrypt(vote) for vote in vote_vector], repeats),
+                key_bits=bits, candidates=count
+            )
+
+            # Short exponent with the fixed-base table, what fills the pools of FAST_ENCRYPTION elections
+            record(
+                'encrypt_fast',
+                measure(lambda: [encryptor.encrypt(vote) for vote in vote_vector], repeats),
+                key_bits=bits, candidates=count
+            )
+
+            # The pooled path cast_vote uses now; the r^n factors are computed up front
+            pool = ObfuscatorPool(public_key, 0, count * repeats)
+            pool.add(generate_obfuscators(public_key.n, count * repeats))
+            record(
+                'encrypt_pooled',
+                measure(lambda: [pool.encrypt(vote) for vote in vote_vector], repeats),
+                key_bits=bits, candidates=count
+            )
+
+            # What the server does instead for client-encrypted ballots: check their proofs in a batch
+            context = ballot_context('bench', 'voter')
+            proved = []
+            for index in range(VERIFY_BATCH):
+                ciphertexts, proof = encrypt_ballot(public_key.n, one_hot(count, index % count), [0, 1], context, True)
+                proved.append({
+                    'ciphertexts': ciphertexts, 'proof': proof, 'allowed': [0, 1],
+                    'context': context, 'one_hot': True
+                })
+            record(
+                'ballot_verify',
+                measure(lambda: verify_ballot_batch(public_key.n, proved), repeats, operations=VERIFY_BATCH),
+                key_bits=bits, candidates=count
+            )
+
+            samples = [
+                encode_ciphertexts(
+                    [public_key.encrypt(vote).ciphertext() for vote in one_hot(count, index % count)],
+                    width
+                )
+                for index in range(DISTINCT_BALLOTS)
+            ]
+
+            aggregate = None
+            for ballots in ballot_counts:
+                stored = [samples[index % DISTINCT_BALLOTS] for index in range(ballots)]
+                record(
+                    'tally_aggregate',
+                    measure(lambda: aggregate_shard(public_key.n, stored), repeats, operations=ballots),
+                    key_bits=bits, candidates=count, ballots=ballots
+                )
+                aggregate = aggregate_shard(public_key.n, stored)[0]
+
+            if aggregate is not None:
+                record(
+                    'tally_decrypt',
+                    measure(lambda: decrypt_tally(public_key, private_key, aggregate), repeats, operations=count),
+                    key_bits=bits, candidates=count
+                )
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare medians against a baseline. Returns rows of
+    (case, baseline median, current median, ratio, status).
+    """
+    rows = []
+    for case, result in results.items():
+        base = baseline.get(case)
+        if base is None:
+            rows.append((case, None, result['median'], None, 'new'))
+            continue
+
+        ratio = result['median'] / base['median']
+        if ratio > 1 + tolerance:
+            status = 'regression'
+        elif ratio < 1 - tolerance:
+            status = 'improved'
+        else:
+            status = 'ok'
+        rows.append((case, base['median'], result['median'], ratio, status))
+    return rows
+
+
+def environment():
+    try:
+        import gmpy2
+        gmpy2_version = gmpy2.version()
+    except ImportError:
+        gmpy2_version = None
+
+    return {
+        'created_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'phe': phe.__version__,
+        'gmpy2': gmpy2_version
+    }
+
+
+def parse_ints(value):
+    return [int(item) for item in value.split(',') if item.strip()]
+
+
+@click.command()
+@click.option('--key-bits', default='1024,2048', help='Comma-separated Paillier key sizes.')
+@click.option('--candidates', default='3,10', help='Comma-separated candidate counts.')
+@click.option('--ballots', default='1000,10000,100000', help='Comma-separated ballot counts for the tally.')
+@click.option('--repeats', default=3, type=int, help='Timed runs per case, the median is reported.')
+@click.option('--output', default='bench_results.json', help='Where to write the results.')
+@click.option('--baseline', default=None, help='Baseline results to compare against.')
+@click.option('--save-baseline', is_flag=True, help='Write the results to --baseline instead of comparing.')
+@click.option('--tolerance', default=0.15, type=float, help='Allowed slowdown before a case counts as a regression.')
+def main(key_bits, candidates, ballots, repeats, output, baseline, save_baseline, tolerance):
+    results = run_suite(parse_ints(key_bits), parse_ints(candidates), parse_ints(ballots), repeats)
+    document = {'environment': environment(), 'results': results}
+
+    with open(output, 'w') as f:
+        json.dump(document, f, indent=2)
+    click.echo(f"Wrote {len(results)} results to {output}")
+
+    if not baseline:
+        return
+    if save_baseline:
+        with open(baseline, 'w') as f:
+            json.dump(document, f, indent=2)
+        click.echo(f"Saved baseline to {baseline}")
+        return
+
+    with open(baseline) as f:
+        rows = compare(results, json.load(f)['results'], tolerance)
+
+    regressions = 0
+    for case, base, current, ratio, status in rows:
+        if ratio is None:
+            click.echo(f"{case:<55} {'':>12} {current * 1000:10.3f} ms   {status}")
+            continue
+        click.echo(f"{case:<55} {base * 1000:10.3f} ms {current * 1000:10.3f} ms  x{ratio:5.2f}  {status}")
+        regressions += status == 'regression'
+
+    if regressions:
+        click.echo(f"{regressions} case(s) slower than the baseline by more than {tolerance:.0%}")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+# crypto_service.py
+from concurrent.futures import ProcessPoolExecutor, Future, InvalidStateError, TimeoutError as FutureTimeout
+import multiprocessing
+import os
+import threading
+import time
+from metrics import crypto_queue_depth, crypto_queue_wait, crypto_rejected
+
+
+class CryptoUnavailable(Exception):
+    pass
+
+
+class CryptoBusy(CryptoUnavailable):
+    pass
+
+
+class CryptoTimeout(CryptoUnavailable):
+    pass
+
+
+def parse_timeouts(value):
+    """Per-operation timeouts from a setting like 'decrypt=10,pbkdf2=5'."""
+    timeouts = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            operation, seconds = item.split('=', 1)
+            timeouts[operation.strip()] = float(seconds)
+    return timeouts
+
+
+def _timed_call(fn, args, submitted_at):
+    # Runs in the worker; reports how long the operation waited for it
+    started_at = time.time()
+    return fn(*args), started_at - submitted_at
+
+
+class CryptoService:
+    """
+    Process pool for the Paillier and PBKDF2 work of request handlers, so
+    the modexps run outside the web process and never hold its GIL.
+
+    At most max_queue operations are admitted at once, running or waiting.
+    submit() waits up to admission_timeout for a slot and raises CryptoBusy
+    when there is none. run() also waits at most the operation's timeout for
+    the result and raises CryptoTimeout after that.
+
+    Functions and arguments must be picklable: module-level functions taking
+    plain integers and strings, not key objects.
+    """
+
+    def __init__(self, workers=None, max_queue=256, admission_timeout=1.0,
+                 default_timeout=30.0, timeouts=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.admission_timeout = admission_timeout
+        self.default_timeout = default_timeout
+        self.timeouts = timeouts or {}
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.busy = 0
+        self.timed_out = 0
+        self._depth = 0
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn, so workers never inherit locks held by request threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def timeout_for(self, operation):
+        return self.timeouts.get(operation, self.default_timeout)
+
+    def submit(self, operation, fn, *args, block=False):
+        """
+        Queue fn(*args) on the pool and return a Future of its result.
+        With block=True wait for a free slot instead of raising CryptoBusy,
+        for background work that should be throttled rather than refused.
+        """
+        if not self._slots.acquire(timeout=None if block else self.admission_timeout):
+            with self._lock:
+                self.busy += 1
+            crypto_rejected.inc(operation=operation, reason='busy')
+            raise CryptoBusy(f"Crypto queue is full ({self.max_queue} operations)")
+
+        with self._lock:
+            self._depth += 1
+            self.submitted += 1
+        crypto_queue_depth.inc()
+
+        try:
+            work = self._get_executor().submit(_timed_call, fn, args, time.time())
+        except Exception:
+            self._release()
+            raise
+
+        result = Future()
+        # Abandoning the result also drops the work if no worker has started it
+        result.add_done_callback(lambda result: work.cancel() if result.cancelled() else None)
+        work.add_done_callback(lambda work: self._settle(operation, work, result))
+        return result
+
+    def _release(self):
+        with self._lock:
+            self._depth -= 1
+        crypto_queue_depth.dec()
+        self._slots.release()
+
+    def _settle(self, operation, work, result):
+        self._release()
+        if work.cancelled():
+            return
+
+        try:
+            value, waited = work.result()
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            try:
+                result.set_exception(e)
+            except InvalidStateError:
+                # The caller cancelled it in the meantime
+                pass
+            return
+
+        crypto_queue_wait.observe(max(waited, 0), operation=operation)
+        with self._lock:
+            self.completed += 1
+        try:
+            result.set_result(value)
+        except InvalidStateError:
+            # The caller cancelled it in the meantime
+            pass
+
+    def run(self, operation, fn, *args, timeout=None):
+        """Run fn(*args) on the pool and wait for the result."""
+        future = self.submit(operation, fn, *args)
+        timeout = timeout or self.timeout_for(operation)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            future.cancel()
+            with self._lock:
+                self.timed_out += 1
+            crypto_rejected.inc(operation=operation, reason='timeout')
+            raise CryptoTimeout(f"Crypto operation {operation} did not finish within {timeout} seconds")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'depth': self._depth,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'busy': self.busy,
+                'timed_out': self.timed_out
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
@@ -0,0 +1,60 @@
+# db_pool.py
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+import contextvars
+import httpx
+
+
+def create_http_client(max_connections=100, max_keepalive=20, keepalive_expiry=30,
+                       timeout=10, http2=False):
+    """
+    Shared HTTP client for the database API. Connections are kept alive and
+    reused across requests and threads instead of paying a TCP and TLS
+    handshake per query.
+    """
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry
+        ),
+        timeout=httpx.Timeout(timeout),
+        http2=http2,
+        follow_redirects=True
+    )
+
+
+class LookupTimeout(Exception):
+    pass
+
+
+class ParallelLookups:
+    """
+    Runs the independent database lookups of one request side by side on a
+    shared thread pool, so a handler waits for the slowest query rather
+    than the sum of all of them.
+    """
+
+    def __init__(self, workers=16, timeout=5):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='db-lookup')
+
+    def gather(self, *calls, timeout=None):
+        """
+        Call each function concurrently and return their results in order.
+        Raises the first error, or LookupTimeout if they do not all finish
+        within timeout seconds. Calls must not gather themselves, a nested
+        wait on the same pool can starve it.
+        """
+        # Each call runs in a copy of the caller's context, so request tracing follows it
+        futures = [self._executor.submit(contextvars.copy_context().run, call) for call in calls]
+        done, not_done = wait(futures, timeout=timeout or self.timeout, return_when=FIRST_EXCEPTION)
+
+        for future in not_done:
+            future.cancel()
+        for future in futures:
+            if future in done and future.exception() is not None:
+                raise future.exception()
+        if not_done:
+            raise LookupTimeout(f"{len(not_done)} of {len(futures)} database lookups timed out")
+
+        return [future.result() for future in futures]
@@ -0,0 +1,89 @@
+# election_cache.py
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+
+
+def key_fingerprint(serialized_public_key):
+    """Short stable identifier of an election public key."""
+    return hashlib.sha256(serialized_public_key.encode('utf-8')).hexdigest()
+
+
+class ElectionCache:
+    """
+    In-process cache of Election rows and candidate lists, with LRU size and
+    TTL eviction.
+
+    Elections are cached under their election_id and their public-key
+    fingerprint. Rows are shared between requests, so callers must not
+    modify what they get back. Writers call invalidate(); other processes
+    see a change once their copy expires.
+    """
+
+    def __init__(self, max_size=256, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        value = loader()
+        # Misses are not cached, a missing election may be created any moment
+        if value:
+            self._put(key, value)
+        return value
+
+    def _put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_election(self, election_id, loader):
+        election = self._get(('election', str(election_id)), loader)
+        if election:
+            self._put(('fingerprint', key_fingerprint(election['public_key'])), election)
+        return election
+
+    def get_election_by_public_key(self, serialized_public_key, loader):
+        election = self._get(('fingerprint', key_fingerprint(serialized_public_key)), loader)
+        if election:
+            self._put(('election', str(election['election_id'])), election)
+        return election
+
+    def get_candidates(self, election_id, loader):
+        return self._get(('candidates', str(election_id)), loader)
+
+    def invalidate(self, election_id):
+        election_id = str(election_id)
+        with self._lock:
+            stale = [
+                key for key, (value, expires_at) in self._entries.items()
+                if key[1] == election_id
+                or (key[0] == 'fingerprint' and str(value['election_id']) == election_id)
+            ]
+            for key in stale:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses
+            }
@@ -0,0 +1,127 @@
+# fast_encrypt.py
+#
+# Fixed-base, short-exponent Paillier encryption (the Damgard-Jurik-Nielsen
+# variant). An election gets a public base hs = h^n mod n^2 with h = -y^2
+# mod n for a random y. A ciphertext then uses hs^alpha = (h^alpha)^n for a
+# random alpha of n_length/2 bits instead of r^n for a random r < n.
+#
+# That is still an ordinary Paillier ciphertext with r = h^alpha, so phe
+# decrypts it unchanged. The exponent is half as long and the base is fixed,
+# so the power comes from a precomputed windowed table with no squarings at
+# all. Uses gmpy2 for the arithmetic when it is installed.
+from collections import OrderedDict
+import math
+import secrets
+import threading
+
+try:
+    import gmpy2
+    mpz = gmpy2.mpz
+except ImportError:
+    gmpy2 = None
+    mpz = int
+
+DEFAULT_WINDOW = 6
+# Tables kept per worker process, one per election key
+MAX_CACHED_TABLES = 8
+
+
+def alpha_bits(n):
+    return max(256, n.bit_length() // 2)
+
+
+def random_unit(n):
+    while True:
+        y = secrets.randbelow(n)
+        if y > 1 and math.gcd(y, n) == 1:
+            return y
+
+
+def generate_encryption_base(n):
+    """A fresh public base h^n mod n^2 for an election, h = -y^2 mod n."""
+    h = (-random_unit(n) ** 2) % n
+    if gmpy2 is not None:
+        return int(gmpy2.powmod(h, n, n * n))
+    return pow(h, n, n * n)
+
+
+class FixedBaseTable:
+    """
+    base^e mod modulus for any e below 2^exponent_bits. Row i holds
+    base^(j * 2^(window*i)) for every window digit j, so a power is one
+    multiplication per window of the exponent.
+    """
+
+    def __init__(self, base, modulus, exponent_bits, window=DEFAULT_WINDOW):
+        self.window = window
+        self.mask = (1 << window) - 1
+        self.modulus = mpz(modulus)
+        self.rows = []
+
+        power = mpz(base) % self.modulus
+        for _ in range(math.ceil(exponent_bits / window)):
+            row = [mpz(1), power]
+            for _ in range(2, 1 << window):
+                row.append(row[-1] * power % self.modulus)
+            self.rows.append(row)
+            # base^(2^(window*(i+1)))
+            power = row[-1] * power % self.modulus
+
+    def power(self, exponent):
+        result = mpz(1)
+        for row in self.rows:
+            digit = exponent & self.mask
+            if digit:
+                result = result * row[digit] % self.modulus
+            exponent >>= self.window
+        if exponent:
+            raise ValueError("exponent is larger than the table")
+        return int(result)
+
+
+class FastEncryptor:
+    """Paillier encryption with one election's fixed base."""
+
+    def __init__(self, n, base, window=DEFAULT_WINDOW):
+        self.n = n
+        self.nsquare = n * n
+        self.alpha_bits = alpha_bits(n)
+        self.table = FixedBaseTable(base, self.nsquare, self.alpha_bits, window)
+
+    def obfuscator(self):
+        """A fresh factor hs^alpha, the equivalent of r^n."""
+        return self.table.power(secrets.randbits(self.alpha_bits))
+
+    def encrypt(self, plaintext):
+        """
+        Encrypt a non-negative integer and return the raw ciphertext, which
+        decrypts like public_key.encrypt(plaintext).ciphertext().
+        """
+        return (self.n * plaintext + 1) % self.nsquare * self.obfuscator() % self.nsquare
+
+
+_encryptors = OrderedDict()
+_encryptors_lock = threading.Lock()
+
+
+def get_encryptor(n, base, window=DEFAULT_WINDOW):
+    """The cached FastEncryptor of a key, building its table on first use."""
+    key = (n, base, window)
+    with _encryptors_lock:
+        encryptor = _encryptors.get(key)
+        if encryptor is not None:
+            _encryptors.move_to_end(key)
+            return encryptor
+
+    encryptor = FastEncryptor(n, base, window)
+    with _encryptors_lock:
+        _encryptors[key] = encryptor
+        while len(_encryptors) > MAX_CACHED_TABLES:
+            _encryptors.popitem(last=False)
+    return encryptor
+
+
+def fast_obfuscators(n, base, count):
+    """count fresh factors hs^alpha. Runs in a worker process."""
+    encryptor = get_encryptor(n, base)
+    return [encryptor.obfuscator() for _ in range(count)]
@@ -0,0 +1,102 @@
+# key_storage.py
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.ciphers import aead
+from base64 import b64encode, b64decode
+import os
+import uuid
+from metrics import crypto_timer
+
+
+class SecureKeyStorage:
+    def __init__(self, master_key):
+        """
+        Initialize secure storage with a master key.
+        The master key is a hex string, normally the MASTER_KEY setting.
+        """
+        if not master_key:
+            raise ValueError("Master key not set")
+        
+        # Convert master key from hex string to bytes
+        self.master_key = bytes.fromhex(master_key)
+        
+    def _generate_key_id(self):
+        """Generate a unique identifier for the key"""
+        return str(uuid.uuid4())
+
+    def encrypt_private_key(self, private_key_data):
+        """
+        Encrypt a private key using AES-GCM.
+        Returns: (encrypted_key, key_id)
+        """
+        # Generate a unique salt for this encryption
+        salt = os.urandom(16)
+        
+        # Generate a unique nonce for AES-GCM
+        nonce = os.urandom(12)
+        
+        # Generate an encryption key using PBKDF2
+        kdf = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=salt,
+            iterations=100000,
+        )
+        with crypto_timer('pbkdf2'):
+            key = kdf.derive(self.master_key)
+        
+        # Create AESGCM cipher
+        aesgcm = aead.AESGCM(key)
+        
+        # Encrypt the private key
+        ciphertext = aesgcm.encrypt(
+            nonce,
+            private_key_data.encode() if isinstance(private_key_data, str) else private_key_data,
+            None  # Additional data if needed
+        )
+        
+        # Combine salt, nonce, and ciphertext for storage
+        encrypted_data = salt + nonce + ciphertext
+        
+        # Generate a unique ID for this key
+        key_id = self._generate_key_id()
+        
+        return b64encode(encrypted_data).decode('utf-8'), key_id
+
+    def decrypt_private_key(self, encrypted_data):
+        """
+        Decrypt an encrypted private key.
+        """
+        # Decode from base64
+        encrypted_data = b64decode(encrypted_data)
+        
+        # Extract components
+        salt = encrypted_data[:16]
+        nonce = encrypted_data[16:28]
+        ciphertext = encrypted_data[28:]
+        
+        # Regenerate the encryption key
+        kdf = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=salt,
+            iterations=100000,
+        )
+        with crypto_timer('pbkdf2'):
+            key = kdf.derive(self.master_key)
+        
+        # Decrypt
+        aesgcm = aead.AESGCM(key)
+        decrypted_data = aesgcm.decrypt(nonce, ciphertext, None)
+        
+        return decrypted_data
+
+
+def wrap_private_key(master_key, private_key_data):
+    """SecureKeyStorage.encrypt_private_key as a plain function, for the crypto workers."""
+    return SecureKeyStorage(master_key).encrypt_private_key(private_key_data)
+
+
+def unwrap_private_key(master_key, encrypted_data):
+    """SecureKeyStorage.decrypt_private_key as a plain function, for the crypto workers."""
+    return SecureKeyStorage(master_key).decrypt_private_key(encrypted_data)
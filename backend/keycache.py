@@ -0,0 +1,129 @@
+# keycache.py
+from collections import OrderedDict
+from contextlib import contextmanager
+import threading
+import time
+
+# Attributes of phe's PaillierPrivateKey that hold secret material
+PRIVATE_KEY_ATTRIBUTES = ('p', 'q', 'psquare', 'qsquare', 'p_inverse', 'hp', 'hq')
+
+
+def zeroize_private_key(private_key):
+    """
+    Overwrite the secret fields of a private key object.
+    Python ints are immutable, so this drops the references rather than
+    wiping memory; the old values are freed once nothing else holds them.
+    """
+    for attribute in PRIVATE_KEY_ATTRIBUTES:
+        if hasattr(private_key, attribute):
+            setattr(private_key, attribute, 0)
+
+
+class _CacheEntry:
+    def __init__(self, private_key, expires_at):
+        self.private_key = private_key
+        self.expires_at = expires_at
+        self.leases = 0
+        self.evicted = False
+
+
+class PrivateKeyCache:
+    """
+    Bounded LRU cache of reconstructed Paillier private keys, keyed by
+    election_id, with a TTL.
+
+    Keys are handed out as leases. An evicted key is zeroized as soon as the
+    last request using it is done, never while a decryption is in flight.
+    """
+
+    def __init__(self, max_size=32, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def lease(self, election_id, loader):
+        """
+        Yield the private key for election_id, calling loader() on a miss.
+        """
+        entry = self._acquire(election_id)
+        if entry is None:
+            # Load outside the lock, the KDF is the slow part
+            entry = self._insert(election_id, loader())
+
+        try:
+            yield entry.private_key
+        finally:
+            self._release(entry)
+
+    def _acquire(self, election_id):
+        with self._lock:
+            entry = self._entries.get(election_id)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._evict(election_id)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(election_id)
+            entry.leases += 1
+            return entry
+
+    def _insert(self, election_id, private_key):
+        entry = _CacheEntry(private_key, time.monotonic() + self.ttl)
+        entry.leases = 1
+
+        with self._lock:
+            if election_id in self._entries:
+                self._evict(election_id)
+            self._entries[election_id] = entry
+
+            while len(self._entries) > self.max_size:
+                self._evict(next(iter(self._entries)))
+
+        return entry
+
+    def _release(self, entry):
+        with self._lock:
+            entry.leases -= 1
+            if entry.evicted and entry.leases == 0:
+                zeroize_private_key(entry.private_key)
+
+    def _evict(self, election_id):
+        # Caller holds the lock
+        entry = self._entries.pop(election_id)
+        entry.evicted = True
+        self.evictions += 1
+        if entry.leases == 0:
+            zeroize_private_key(entry.private_key)
+
+    def evict(self, election_id):
+        """Explicitly drop the cached key of an election."""
+        with self._lock:
+            if election_id in self._entries:
+                self._evict(election_id)
+                return True
+            return False
+
+    def clear(self):
+        with self._lock:
+            for election_id in list(self._entries):
+                self._evict(election_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,132 @@
+# keypool.py
+from phe import paillier
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from collections import deque
+import multiprocessing
+import threading
+import time
+import uuid
+from metrics import crypto_timer
+
+
+def generate_keypair(n_length):
+    """
+    Search for a fresh Paillier keypair. Runs in a worker process.
+    """
+    return paillier.generate_paillier_keypair(n_length=n_length)
+
+
+class KeypairPool:
+    """
+    Bounded pool of election keypairs generated ahead of time.
+
+    A background thread keeps the pool topped up to `size`. The prime search
+    runs in a worker process and `prepare` (e.g. encrypting the private key
+    for storage) runs in the background thread, so create_election only has
+    to pop a ready entry.
+    """
+
+    def __init__(self, prepare, size=2, n_length=paillier.DEFAULT_KEYSIZE):
+        self.prepare = prepare
+        self.size = size
+        self.n_length = n_length
+        self._keypairs = deque()
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._executor = None
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None and self.size > 0:
+                self._thread = threading.Thread(target=self._fill_loop, name='keypair-pool', daemon=True)
+                self._thread.start()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def generate(self):
+        """Generate and prepare one keypair, blocking until it is ready."""
+        with crypto_timer('keygen'):
+            public_key, private_key = self._get_executor().submit(generate_keypair, self.n_length).result()
+        return self.prepare(public_key, private_key)
+
+    def take(self):
+        """Pop a ready keypair, or return None if the pool is empty."""
+        self.start()
+        with self._lock:
+            if not self._keypairs:
+                return None
+            keypair = self._keypairs.popleft()
+            self._not_full.notify()
+            return keypair
+
+    def _fill_loop(self):
+        while True:
+            with self._lock:
+                while len(self._keypairs) >= self.size:
+                    self._not_full.wait()
+
+            try:
+                keypair = self.generate()
+            except Exception as e:
+                print(f"Error pre-generating keypair: {str(e)}")
+                time.sleep(5)
+                continue
+
+            with self._lock:
+                self._keypairs.append(keypair)
+
+    def stats(self):
+        with self._lock:
+            return {'depth': len(self._keypairs), 'size': self.size}
+
+
+class BackgroundJobs:
+    """
+    Runs slow work off the request thread and keeps each job's outcome
+    around for `ttl` seconds so clients can poll for it.
+    """
+
+    def __init__(self, workers=2, ttl=3600):
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='background-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args):
+        job_id = str(uuid.uuid4())
+        now = time.monotonic()
+
+        with self._lock:
+            # Forget finished jobs nobody asked about in time
+            expired = [
+                key for key, (future, created) in self._jobs.items()
+                if future.done() and now - created > self.ttl
+            ]
+            for key in expired:
+                del self._jobs[key]
+
+            self._jobs[job_id] = (self._executor.submit(fn, *args), now)
+
+        return job_id
+
+    def status(self, job_id):
+        """Return the job state, or None if the job is unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+
+        future = job[0]
+        if not future.done():
+            return {'status': 'pending'}
+        if future.exception() is not None:
+            return {'status': 'failed', 'error': str(future.exception())}
+        return {'status': 'done', 'result': future.result()}
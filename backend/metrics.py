@@ -0,0 +1,261 @@
+# metrics.py
+# Minimal Prometheus metrics: counters and histograms with labels, rendered
+# in the text exposition format, plus an optional per-request trace of where
+# the time went.
+from contextlib import contextmanager
+from contextvars import ContextVar
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Spans of the request being traced, as a list of (category, seconds)
+current_trace = ContextVar('current_trace', default=None)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{format_labels(self.labelnames, key)} {value}')
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} gauge']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{format_labels(self.labelnames, key)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            # [per-bucket counts, sum, count]
+            value = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    value[0][index] += 1
+            value[1] += seconds
+            value[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, (counts, total, observed) in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, counts):
+                    labels = format_labels(self.labelnames, key, [('le', float(bound))])
+                    lines.append(f'{self.name}_bucket{labels} {count}')
+                lines.append(f'{self.name}_bucket{format_labels(self.labelnames, key, [("le", "+Inf")])} {observed}')
+                lines.append(f'{self.name}_sum{format_labels(self.labelnames, key)} {total}')
+                lines.append(f'{self.name}_count{format_labels(self.labelnames, key)} {observed}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, *args, **kwargs):
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, *args, **kwargs):
+        metric = Gauge(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+request_seconds = registry.histogram(
+    'http_request_duration_seconds', 'Request latency by endpoint.',
+    ('endpoint', 'method', 'status')
+)
+db_seconds = registry.histogram(
+    'db_call_duration_seconds', 'Database call latency by table and operation.',
+    ('table', 'operation')
+)
+db_errors = registry.counter(
+    'db_call_errors_total', 'Database calls that raised.',
+    ('table', 'operation')
+)
+crypto_seconds = registry.histogram(
+    'crypto_operation_duration_seconds', 'Time spent in one crypto call site.',
+    ('operation',)
+)
+crypto_operations = registry.counter(
+    'crypto_operations_total', 'Individual crypto operations, e.g. one per ciphertext.',
+    ('operation',)
+)
+
+crypto_queue_depth = registry.gauge(
+    'crypto_queue_depth', 'Crypto operations admitted to the worker pool and not finished yet.'
+)
+crypto_queue_wait = registry.histogram(
+    'crypto_queue_wait_seconds', 'Time from submitting a crypto operation until a worker starts it.',
+    ('operation',)
+)
+crypto_rejected = registry.counter(
+    'crypto_rejected_total', 'Crypto operations refused because the queue was full, or abandoned after their timeout.',
+    ('operation', 'reason')
+)
+
+
+def record_span(category, seconds):
+    trace = current_trace.get()
+    if trace is not None:
+        trace.append((category, seconds))
+
+
+@contextmanager
+def crypto_timer(operation, count=1):
+    """Time a crypto call site that performs count operations."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        crypto_seconds.observe(seconds, operation=operation)
+        crypto_operations.inc(count, operation=operation)
+        record_span(operation, seconds)
+
+
+def server_timing(trace, total):
+    """
+    Summarize a request trace as a Server-Timing header value, one entry per
+    category with its total duration in milliseconds and number of calls.
+    """
+    categories = {}
+    for category, seconds in trace:
+        spent, calls = categories.get(category, (0.0, 0))
+        categories[category] = (spent + seconds, calls + 1)
+
+    entries = [
+        f'{category};dur={spent * 1000:.2f};desc="{calls} calls"'
+        for category, (spent, calls) in categories.items()
+    ]
+    entries.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(entries)
+
+
+OPERATIONS = ('select', 'insert', 'upsert', 'update', 'delete')
+
+
+class _TimedQuery:
+    """Forwards a query builder chain and times its execute()."""
+
+    def __init__(self, query, table):
+        self._query = query
+        self._table = table
+        self._operation = 'select'
+
+    def __getattr__(self, name):
+        attribute = getattr(self._query, name)
+        if not callable(attribute):
+            return attribute
+
+        if name == 'execute':
+            def execute(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return attribute(*args, **kwargs)
+                except Exception:
+                    db_errors.inc(table=self._table, operation=self._operation)
+                    raise
+                finally:
+                    seconds = time.perf_counter() - start
+                    db_seconds.observe(seconds, table=self._table, operation=self._operation)
+                    record_span('db', seconds)
+            return execute
+
+        def chain(*args, **kwargs):
+            if name in OPERATIONS:
+                self._operation = name
+            # Builders return a new builder from each call, keep following it
+            self._query = attribute(*args, **kwargs)
+            return self
+        return chain
+
+
+class InstrumentedClient:
+    """
+    Wraps a storage client (Supabase or SQLiteStore) so every table query
+    is timed per table and operation.
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name):
+        return _TimedQuery(self._client.table(name), name)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
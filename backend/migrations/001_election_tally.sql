@@ -0,0 +1,10 @@
+-- Encrypted running tally, one row per election.
+-- encrypted_tally holds one Paillier ciphertext per candidate slot and is
+-- updated with compare-and-swap on version by cast_vote.
+create table if not exists "ElectionTally" (
+    election_id uuid primary key references "Election" (election_id) on delete cascade,
+    encrypted_tally text not null,
+    ballot_count integer not null default 0,
+    version integer not null default 0,
+    updated_at timestamp not null default now()
+);
@@ -0,0 +1,6 @@
+-- Optional packed ballots: the whole one-hot vote vector in one ciphertext,
+-- each candidate in a slot of slot_bits bits. Existing elections stay 'vector'.
+alter table "Election" add column if not exists ballot_mode text not null default 'vector';
+alter table "Election" add column if not exists slot_bits integer;
+alter table "Election" add column if not exists max_voters integer;
+alter table "Election" add column if not exists max_candidates integer;
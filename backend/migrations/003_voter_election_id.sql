@@ -0,0 +1,19 @@
+-- Link voters to their election by election_id instead of a copy of the
+-- election's public key, and index the columns the endpoints filter on.
+alter table "Voter" add column if not exists election_id uuid references "Election" (election_id) on delete cascade;
+alter table "Voter" alter column public_key drop not null;
+
+create index if not exists voter_election_id_idx on "Voter" (election_id);
+create index if not exists votes_election_voter_idx on "Votes" (election_id, voter_id);
+
+-- Backfill existing voters from the public key they carry
+update "Voter" v
+set election_id = e.election_id
+from "Election" e
+where v.election_id is null
+  and v.public_key = e.public_key;
+
+-- The key copies are no longer read once election_id is set
+update "Voter"
+set public_key = null
+where election_id is not null;
@@ -0,0 +1,6 @@
+-- The voter listing pages through an election's roll ordered by voter_id,
+-- so it needs the pair indexed together.
+create index if not exists voter_election_voter_idx on "Voter" (election_id, voter_id);
+
+-- The composite index covers plain election_id lookups as well
+drop index if exists voter_election_id_idx;
@@ -0,0 +1,6 @@
+-- One ballot per voter per election, enforced by the database as well as by
+-- the in-process has-voted index. Remove any duplicate ballots before running.
+create unique index if not exists votes_election_voter_unique_idx on "Votes" (election_id, voter_id);
+
+-- The unique index serves the same lookups
+drop index if exists votes_election_voter_idx;
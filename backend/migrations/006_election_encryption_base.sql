@@ -0,0 +1,4 @@
+-- Optional fixed encryption base h^n mod n^2 per election, set when
+-- FAST_ENCRYPTION is on. Ballots of elections with a base are encrypted with
+-- the short-exponent fixed-base engine; elections without one are unchanged.
+alter table "Election" add column if not exists encryption_base text;
@@ -0,0 +1,10 @@
+-- Results of a closed election, computed once and served to every request.
+-- results is the JSON payload of /api/election/<id>/results exactly as sent,
+-- etag its strong validator. Deleting the row makes the next request
+-- recompute it.
+create table if not exists "ElectionResults" (
+    election_id uuid primary key references "Election" (election_id) on delete cascade,
+    results text not null,
+    etag text not null,
+    created_at timestamp not null default now()
+);
@@ -0,0 +1,200 @@
+# obfuscators.py
+from phe import paillier
+from phe.util import powmod
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import multiprocessing
+import threading
+from fast_encrypt import fast_obfuscators
+
+
+def generate_obfuscators(n, count, base=None):
+    """
+    Compute count fresh obfuscation factors r^n mod n^2, each from its own
+    random r. Runs in a worker process. Elections with a fixed encryption
+    base get the faster hs^alpha factors instead, see fast_encrypt.
+    """
+    if base is not None:
+        return fast_obfuscators(n, base, count)
+
+    public_key = paillier.PaillierPublicKey(n)
+    return [
+        powmod(public_key.get_random_lt_n(), n, public_key.nsquare)
+        for _ in range(count)
+    ]
+
+
+class ObfuscatorPool:
+    """
+    Precomputed obfuscation factors for one election public key.
+
+    Encrypting with a pooled factor is (1 + n*m) * r^n mod n^2, so the
+    expensive r^n modexp happens in the background instead of in cast_vote.
+    Every factor is removed from the pool when it is handed out and is never
+    used twice. On a miss the factor comes from `generate(n, 1, base)`.
+    """
+
+    def __init__(self, public_key, low_watermark, high_watermark, on_low=None, generate=generate_obfuscators,
+                 base=None):
+        self.public_key = public_key
+        self.base = base
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.hits = 0
+        self.misses = 0
+        self._factors = deque()
+        self._lock = threading.Lock()
+        self._on_low = on_low
+        self._generate = generate
+        # Refill from below the low watermark all the way up to the high one
+        self._refilling = True
+
+    def take(self):
+        """Hand out one factor, computing it with generate() if the pool is empty."""
+        with self._lock:
+            if self._factors:
+                factor = self._factors.popleft()
+                self.hits += 1
+            else:
+                factor = None
+                self.misses += 1
+
+            start_refill = len(self._factors) < self.low_watermark and not self._refilling
+            if start_refill:
+                self._refilling = True
+
+        if start_refill and self._on_low:
+            self._on_low()
+
+        if factor is None:
+            factor = self._generate(self.public_key.n, 1, self.base)[0]
+        return factor
+
+    def encrypt(self, plaintext):
+        """
+        Encrypt a non-negative integer and return the raw ciphertext.
+        Equivalent to public_key.encrypt(plaintext).ciphertext().
+        """
+        n, nsquare = self.public_key.n, self.public_key.nsquare
+        nude_ciphertext = (n * plaintext + 1) % nsquare
+        return nude_ciphertext * self.take() % nsquare
+
+    def needs_refill(self):
+        with self._lock:
+            return self._refilling
+
+    def deficit(self):
+        with self._lock:
+            return max(self.high_watermark - len(self._factors), 0)
+
+    def add(self, factors):
+        with self._lock:
+            self._factors.extend(factors[:max(self.high_watermark - len(self._factors), 0)])
+            if len(self._factors) >= self.high_watermark:
+                self._refilling = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'depth': len(self._factors),
+                'low_watermark': self.low_watermark,
+                'high_watermark': self.high_watermark,
+                'hits': self.hits,
+                'misses': self.misses,
+                'refilling': self._refilling
+            }
+
+
+class ObfuscatorPoolManager:
+    """
+    Keeps one ObfuscatorPool per election and refills them from a background
+    thread. The factors themselves are computed in a process pool so refills
+    do not compete with request threads for the GIL.
+    """
+
+    def __init__(self, low_watermark=64, high_watermark=512, workers=1, batch_size=32,
+                 generate=generate_obfuscators):
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.workers = workers
+        self.batch_size = batch_size
+        self.generate = generate
+        self._pools = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._executor = None
+        self._thread = None
+
+    def get_pool(self, election_id, public_key, base=None):
+        with self._lock:
+            pool = self._pools.get(election_id)
+            if pool is None or pool.public_key != public_key or pool.base != base:
+                pool = ObfuscatorPool(
+                    public_key,
+                    self.low_watermark,
+                    self.high_watermark,
+                    on_low=self.request_refill,
+                    generate=self.generate,
+                    base=base
+                )
+                self._pools[election_id] = pool
+                new_pool = True
+            else:
+                new_pool = False
+
+        if new_pool:
+            self.request_refill()
+        return pool
+
+    def discard(self, election_id):
+        with self._lock:
+            self._pools.pop(election_id, None)
+
+    def request_refill(self):
+        with self._lock:
+            if self._thread is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                self._thread = threading.Thread(target=self._refill_loop, name='obfuscator-refill', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def _refill_loop(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+
+            while True:
+                with self._lock:
+                    pools = [pool for pool in self._pools.values() if pool.needs_refill()]
+                if not pools:
+                    break
+
+                failed = False
+                batches = []
+                try:
+                    for pool in pools:
+                        for _ in range(self.workers):
+                            count = min(self.batch_size, pool.deficit())
+                            if count > 0:
+                                batches.append((pool, self._executor.submit(generate_obfuscators, pool.public_key.n, count, pool.base)))
+                except Exception as e:
+                    print(f"Error scheduling obfuscator refill: {str(e)}")
+                    failed = True
+
+                for pool, future in batches:
+                    try:
+                        pool.add(future.result())
+                    except Exception as e:
+                        print(f"Error refilling obfuscator pool: {str(e)}")
+                        failed = True
+
+                # Wait for the next request instead of spinning on a broken worker
+                if failed:
+                    break
+
+    def stats(self):
+        with self._lock:
+            return {election_id: pool.stats() for election_id, pool in self._pools.items()}
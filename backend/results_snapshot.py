@@ -0,0 +1,201 @@
+# results_snapshot.py
+from collections import OrderedDict
+from datetime import datetime
+import hashlib
+import heapq
+import json
+import threading
+import time
+
+
+def make_snapshot(results):
+    """
+    Serialize a results payload once. The body is canonical JSON, so every
+    process derives the same strong ETag from the same results.
+    """
+    body = json.dumps(results, sort_keys=True, separators=(',', ':'))
+    return snapshot_from(body, hashlib.sha256(body.encode('utf-8')).hexdigest()[:32])
+
+
+def snapshot_from(body, etag):
+    """A snapshot as stored in ElectionResults."""
+    return {'body': body, 'etag': etag}
+
+
+class ResultsCache:
+    """
+    In-process cache of the results snapshots of closed elections, with LRU
+    size and TTL eviction.
+
+    Snapshots never change once taken, the TTL only bounds how long another
+    process keeps serving one that was invalidated. Only one loader per
+    election runs at a time in this process, so a crowd arriving at the close
+    computes the results once.
+    """
+
+    def __init__(self, max_size=256, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def peek(self, election_id):
+        """The cached snapshot of an election, or None."""
+        key = str(election_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            return None
+
+    def get(self, election_id, loader):
+        """The snapshot of an election, calling loader() on a miss."""
+        key = str(election_id)
+        snapshot = self.peek(key)
+        if snapshot is not None:
+            return snapshot
+
+        with self._lock:
+            self.misses += 1
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        with loading:
+            # Someone else may have loaded it while we waited
+            snapshot = self.peek(key)
+            if snapshot is not None:
+                return snapshot
+            snapshot = loader()
+            with self._lock:
+                self.loads += 1
+                self._entries[key] = (snapshot, time.monotonic() + self.ttl)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                self._loading.pop(key, None)
+            return snapshot
+
+    def invalidate(self, election_id):
+        with self._lock:
+            return self._entries.pop(str(election_id), None) is not None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'loads': self.loads
+            }
+
+
+class ResultsScheduler:
+    """
+    Takes the results snapshot of each election shortly after its end_time,
+    so the first dashboard refresh after the close finds it ready.
+
+    `build(election_id)` returns False to be tried again `retry` seconds
+    later, e.g. while ballots cast before the close are still being written.
+    An election is given up after max_attempts failed or deferred builds; its
+    results are then computed by the first request instead.
+    """
+
+    def __init__(self, build, delay=5, retry=30, max_attempts=10):
+        self.build = build
+        self.delay = delay
+        self.retry = retry
+        self.max_attempts = max_attempts
+        self.built = 0
+        self.deferred = 0
+        self.failures = 0
+        self.given_up = 0
+        self._queue = []
+        self._due = {}
+        self._thread = None
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run_loop, name='results-scheduler', daemon=True)
+                self._thread.start()
+
+    def schedule(self, election_id, end_time, attempt=0):
+        """Build the snapshot of election_id once end_time (a naive local datetime or ISO string) is past."""
+        if isinstance(end_time, str):
+            end_time = datetime.fromisoformat(end_time)
+        due = end_time.timestamp() + self.delay
+        self._push(str(election_id), due, attempt)
+        self.start()
+
+    def _push(self, election_id, due, attempt):
+        with self._lock:
+            self._due[election_id] = due
+            heapq.heappush(self._queue, (due, election_id, attempt))
+            self._changed.notify()
+
+    def _next(self):
+        with self._lock:
+            while True:
+                if not self._queue:
+                    self._changed.wait()
+                    continue
+                due, election_id, attempt = self._queue[0]
+                wait = due - time.time()
+                if wait > 0:
+                    self._changed.wait(wait)
+                    continue
+                heapq.heappop(self._queue)
+                # Rescheduled since, the newer entry is the one that counts
+                if self._due.get(election_id) != due:
+                    continue
+                del self._due[election_id]
+                return election_id, attempt
+
+    def _run_loop(self):
+        while True:
+            election_id, attempt = self._next()
+            try:
+                done = self.build(election_id)
+            except Exception as e:
+                print(f"Error building results snapshot for {election_id}: {str(e)}")
+                done = None
+
+            with self._lock:
+                if done:
+                    self.built += 1
+                elif done is None:
+                    self.failures += 1
+                else:
+                    self.deferred += 1
+            if done:
+                continue
+
+            if attempt + 1 >= self.max_attempts:
+                with self._lock:
+                    self.given_up += 1
+                print(f"Giving up on the results snapshot for {election_id} after {attempt + 1} attempts")
+                continue
+            self._push(election_id, time.time() + self.retry, attempt + 1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'scheduled': len(self._due),
+                'next_due_seconds': round(max(0, self._queue[0][0] - time.time()), 3) if self._queue else None,
+                'built': self.built,
+                'deferred': self.deferred,
+                'failures': self.failures,
+                'given_up': self.given_up,
+                'delay': self.delay,
+                'retry': self.retry
+            }
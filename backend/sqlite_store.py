@@ -0,0 +1,312 @@
+# sqlite_store.py
+import json
+import re
+import sqlite3
+import threading
+
+# Mirrors the Supabase tables and the migrations in migrations/
+SCHEMA = '''
+create table if not exists "Admin" (
+    admin_id text primary key,
+    username text not null unique,
+    password text not null,
+    created_at text
+);
+
+create table if not exists "Election" (
+    election_id text primary key,
+    election_name text,
+    public_key text not null,
+    start_time text,
+    end_time text,
+    status text,
+    created_at text,
+    ballot_mode text not null default 'vector',
+    slot_bits integer,
+    max_voters integer,
+    max_candidates integer,
+    encryption_base text
+);
+create index if not exists election_public_key_idx on "Election" (public_key);
+
+create table if not exists "ElectionKeys" (
+    key_id text primary key,
+    election_id text not null references "Election" (election_id) on delete cascade,
+    encrypted_private_key text not null,
+    created_at text
+);
+create index if not exists election_keys_election_idx on "ElectionKeys" (election_id);
+
+create table if not exists "ElectionTally" (
+    election_id text primary key references "Election" (election_id) on delete cascade,
+    encrypted_tally text not null,
+    ballot_count integer not null default 0,
+    version integer not null default 0,
+    updated_at text not null default current_timestamp
+);
+
+create table if not exists "ElectionResults" (
+    election_id text primary key references "Election" (election_id) on delete cascade,
+    results text not null,
+    etag text not null,
+    created_at text not null default current_timestamp
+);
+
+create table if not exists "Candidate" (
+    candidate_id text primary key,
+    election_id text not null references "Election" (election_id) on delete cascade,
+    name text,
+    party_name text,
+    avatar_url text
+);
+create index if not exists candidate_election_idx on "Candidate" (election_id);
+
+create table if not exists "Voter" (
+    voter_id text primary key,
+    election_id text references "Election" (election_id) on delete cascade,
+    name text,
+    email text,
+    gender text,
+    public_key text,
+    created_at text
+);
+create index if not exists voter_election_voter_idx on "Voter" (election_id, voter_id);
+create index if not exists voter_email_idx on "Voter" (email);
+
+create table if not exists "Votes" (
+    vote_id text primary key,
+    voter_id text not null references "Voter" (voter_id) on delete cascade,
+    election_id text not null references "Election" (election_id) on delete cascade,
+    encrypted_vote text not null,
+    random_value text,
+    created_at text
+);
+-- One ballot per voter per election
+create unique index if not exists votes_election_voter_unique_idx on "Votes" (election_id, voter_id);
+drop index if exists votes_election_voter_idx;
+create index if not exists votes_voter_idx on "Votes" (voter_id);
+'''
+
+# Columns added to SCHEMA after its first release, as (table, column, definition)
+ADDED_COLUMNS = [
+    ('Election', 'encryption_base', 'text'),
+]
+
+IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def quote(identifier):
+    # Table and column names cannot be bound as parameters, so only plain names are allowed
+    if not IDENTIFIER.match(identifier):
+        raise ValueError(f"Invalid identifier {identifier!r}")
+    return f'"{identifier}"'
+
+
+def to_param(value):
+    if value is None or isinstance(value, (int, float, str, bytes)):
+        return value
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    # uuid.UUID, Decimal and the like are stored as their text form
+    return str(value)
+
+
+class QueryResult:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class SQLiteQuery:
+    """
+    The subset of the postgrest query builder the backend uses, compiled to
+    one parameterized statement. The SQL text only depends on the shape of
+    the query, so sqlite3's per-connection statement cache reuses the
+    prepared statement across requests.
+    """
+
+    def __init__(self, store, table):
+        self.store = store
+        self.table = quote(table)
+        self.operation = 'select'
+        self.columns = '*'
+        self.count = None
+        self.head = False
+        self.payload = None
+        self.on_conflict = None
+        self.ignore_duplicates = False
+        self.filters = []
+        self.params = []
+        self.ordering = None
+        self.row_limit = None
+
+    def select(self, *columns, count=None, head=False):
+        if columns and columns != ('*',):
+            self.columns = ', '.join(quote(column) for column in columns)
+        self.count = count
+        self.head = head
+        return self
+
+    def insert(self, rows):
+        self.operation = 'insert'
+        self.payload = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows, on_conflict=None, ignore_duplicates=False):
+        self.insert(rows)
+        self.on_conflict = on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, values):
+        self.operation = 'update'
+        self.payload = values
+        return self
+
+    def delete(self):
+        self.operation = 'delete'
+        return self
+
+    def _filter(self, column, operator, value):
+        self.filters.append(f'{quote(column)} {operator} ?')
+        self.params.append(to_param(value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, '=', value)
+
+    def neq(self, column, value):
+        return self._filter(column, '!=', value)
+
+    def gt(self, column, value):
+        return self._filter(column, '>', value)
+
+    def gte(self, column, value):
+        return self._filter(column, '>=', value)
+
+    def lt(self, column, value):
+        return self._filter(column, '<', value)
+
+    def lte(self, column, value):
+        return self._filter(column, '<=', value)
+
+    def in_(self, column, values):
+        values = list(values)
+        self.filters.append(f'{quote(column)} in ({", ".join("?" * len(values))})')
+        self.params.extend(to_param(value) for value in values)
+        return self
+
+    def order(self, column, desc=False):
+        self.ordering = f'{quote(column)} {"desc" if desc else "asc"}'
+        return self
+
+    def limit(self, count):
+        self.row_limit = int(count)
+        return self
+
+    def _where(self):
+        return f' where {" and ".join(self.filters)}' if self.filters else ''
+
+    def execute(self):
+        return getattr(self, f'_execute_{self.operation}')()
+
+    def _execute_select(self):
+        where = self._where()
+        count = None
+        if self.count is not None:
+            count = self.store.query(f'select count(*) as count from {self.table}{where}', self.params)[0]['count']
+        if self.head:
+            return QueryResult([], count)
+
+        sql = f'select {self.columns} from {self.table}{where}'
+        params = list(self.params)
+        if self.ordering:
+            sql += f' order by {self.ordering}'
+        if self.row_limit is not None:
+            sql += ' limit ?'
+            params.append(self.row_limit)
+        return QueryResult(self.store.query(sql, params), count)
+
+    def _execute_insert(self):
+        if self.on_conflict is None:
+            conflict = ''
+        elif self.ignore_duplicates:
+            conflict = f' on conflict ({quote(self.on_conflict)}) do nothing'
+        else:
+            conflict = f' on conflict ({quote(self.on_conflict)}) do update set {{updates}}'
+
+        statements = []
+        for row in self.payload:
+            columns = list(row)
+            sql = f'insert into {self.table} ({", ".join(quote(column) for column in columns)})' \
+                  f' values ({", ".join("?" * len(columns))})' \
+                  + conflict.format(updates=', '.join(f'{quote(column)} = excluded.{quote(column)}' for column in columns)) \
+                  + ' returning *'
+            statements.append((sql, [to_param(row[column]) for column in columns]))
+        return QueryResult(self.store.write(statements))
+
+    def _execute_update(self):
+        columns = list(self.payload)
+        sql = f'update {self.table} set {", ".join(f"{quote(column)} = ?" for column in columns)}' \
+              f'{self._where()} returning *'
+        params = [to_param(self.payload[column]) for column in columns] + self.params
+        return QueryResult(self.store.write([(sql, params)]))
+
+    def _execute_delete(self):
+        return QueryResult(self.store.write([(f'delete from {self.table}{self._where()} returning *', self.params)]))
+
+
+class SQLiteStore:
+    """
+    Embedded storage engine with the same table(...) query API as the
+    Supabase client, for on-premises servers and offline load tests.
+
+    Each thread gets its own connection. The database runs in WAL mode so
+    readers never block the writer.
+    """
+
+    def __init__(self, path, busy_timeout=5000, cached_statements=256):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self.connection().executescript(SCHEMA)
+        self._add_missing_columns()
+
+    def _add_missing_columns(self):
+        # Databases created before a column was added to SCHEMA
+        connection = self.connection()
+        for table, column, definition in ADDED_COLUMNS:
+            columns = {row['name'] for row in connection.execute(f'pragma table_info({quote(table)})')}
+            if column not in columns:
+                connection.execute(f'alter table {quote(table)} add column {quote(column)} {definition}')
+
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout / 1000,
+                cached_statements=self.cached_statements
+            )
+            connection.row_factory = sqlite3.Row
+            connection.execute('pragma journal_mode = wal')
+            connection.execute('pragma synchronous = normal')
+            connection.execute('pragma foreign_keys = on')
+            self._local.connection = connection
+        return connection
+
+    def query(self, sql, params):
+        return [dict(row) for row in self.connection().execute(sql, params).fetchall()]
+
+    def write(self, statements):
+        """Run the statements in one transaction and return the rows they returned."""
+        connection = self.connection()
+        rows = []
+        with connection:
+            for sql, params in statements:
+                rows.extend(dict(row) for row in connection.execute(sql, params).fetchall())
+        return rows
+
+    def table(self, name):
+        return SQLiteQuery(self, name)
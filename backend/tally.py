@@ -0,0 +1,266 @@
+# tally.py
+from phe import paillier
+from collections import deque
+import time
+from ballot_codec import decode_ciphertexts, encode_ciphertexts, ciphertext_width
+
+
+def load_encrypted_vote(encrypted_vote):
+    """
+    Return the list of ciphertext integers stored in a Votes.encrypted_vote value,
+    in either the binary format or a legacy JSON list.
+    """
+    return decode_ciphertexts(encrypted_vote)
+
+
+def aggregate_ballots(public_key, ballots, num_candidates):
+    """
+    Homomorphically add up the ballots slot by slot.
+
+    Paillier is additive: multiplying ciphertexts modulo n^2 gives an
+    encryption of the sum of their plaintexts. The result is one raw
+    ciphertext per candidate slot, which decrypts to that candidate's count.
+    """
+    nsquare = public_key.nsquare
+    # 1 is a (non-obfuscated) encryption of 0, the identity for the product
+    aggregate = [1] * num_candidates
+
+    for ballot in ballots:
+        ciphertexts = load_encrypted_vote(ballot)
+        for index in range(min(num_candidates, len(ciphertexts))):
+            aggregate[index] = aggregate[index] * ciphertexts[index] % nsquare
+
+    return aggregate
+
+
+def fold_ballot(public_key, aggregate, ciphertexts):
+    """
+    Fold one ballot into a running aggregate in place and return it.
+    The aggregate grows with 1s (encryptions of 0) if the ballot is longer.
+    """
+    nsquare = public_key.nsquare
+    aggregate.extend([1] * (len(ciphertexts) - len(aggregate)))
+    for index, ciphertext in enumerate(ciphertexts):
+        aggregate[index] = aggregate[index] * ciphertext % nsquare
+    return aggregate
+
+
+def serialize_tally(public_key, aggregate):
+    return encode_ciphertexts(aggregate, ciphertext_width(public_key))
+
+
+def decrypt_tally(public_key, private_key, aggregate):
+    """
+    Decrypt the per-candidate aggregate ciphertexts into vote counts.
+    """
+    return [
+        private_key.decrypt(paillier.EncryptedNumber(public_key, ciphertext))
+        for ciphertext in aggregate
+    ]
+
+
+def homomorphic_tally(public_key, private_key, ballots, num_candidates):
+    """
+    Count the votes per candidate with only num_candidates decryptions.
+    """
+    aggregate = aggregate_ballots(public_key, ballots, num_candidates)
+    return decrypt_tally(public_key, private_key, aggregate)
+
+
+def per_ballot_tally(public_key, private_key, ballots, num_candidates, slot_bits=None):
+    """
+    Reference tally that decrypts every ballot and counts the selected slot.
+    This costs one decryption per ballot element and is only used to verify
+    the homomorphic tally. slot_bits is set for packed ballots.
+    """
+    counts = [0] * num_candidates
+
+    for ballot in ballots:
+        decrypted_vote_vector = [
+            private_key.decrypt(paillier.EncryptedNumber(public_key, ciphertext))
+            for ciphertext in load_encrypted_vote(ballot)
+        ]
+        if slot_bits:
+            decrypted_vote_vector = unpack_counts(decrypted_vote_vector[0], slot_bits, num_candidates)
+
+        # Identify the candidate index with the highest value
+        selected_candidate_index = decrypted_vote_vector.index(max(decrypted_vote_vector))
+        counts[selected_candidate_index] += 1
+
+    return counts
+
+
+def packed_slot_bits(max_voters):
+    """Bits per candidate slot so a slot can count every voter on the roll."""
+    return max(int(max_voters), 1).bit_length()
+
+
+def packed_ballot_fits(n_length, slot_bits, max_candidates):
+    """
+    Whether every slot fits in one plaintext. phe reads plaintexts above n/3
+    as negative numbers, so stay below 2^(n_length - 3).
+    """
+    return slot_bits * max_candidates <= n_length - 3
+
+
+def pack_vote_vector(vote_vector, slot_bits):
+    """
+    Pack a vote vector into one plaintext, candidate i in bits
+    [i*slot_bits, (i+1)*slot_bits). Adding packed ballots adds every slot.
+    """
+    return sum(vote << (index * slot_bits) for index, vote in enumerate(vote_vector))
+
+
+def unpack_counts(plaintext, slot_bits, num_candidates):
+    """Split a packed plaintext back into one count per candidate."""
+    mask = (1 << slot_bits) - 1
+    return [(plaintext >> (index * slot_bits)) & mask for index in range(num_candidates)]
+
+
+def aggregate_shard(n, ballots):
+    """
+    Multiply out one shard of ballots. Runs inside a tally worker process, so
+    it takes the modulus instead of a key object and parses the ballots itself.
+    Returns (aggregate, ballot_count, seconds).
+    """
+    start = time.perf_counter()
+    public_key = paillier.PaillierPublicKey(n)
+
+    aggregate = []
+    for ballot in ballots:
+        fold_ballot(public_key, aggregate, load_encrypted_vote(ballot))
+
+    return aggregate, len(ballots), time.perf_counter() - start
+
+
+def decrypt_ciphertexts(n, p, q, ciphertexts):
+    """
+    Decrypt raw ciphertexts to integers. Runs in a crypto worker process,
+    so it takes the key as integers.
+    """
+    public_key = paillier.PaillierPublicKey(n)
+    return decrypt_tally(public_key, paillier.PaillierPrivateKey(public_key, p, q), ciphertexts)
+
+
+def per_ballot_tally_shard(n, p, q, ballots, num_candidates, slot_bits=None):
+    """per_ballot_tally of one shard, in a crypto worker process."""
+    public_key = paillier.PaillierPublicKey(n)
+    private_key = paillier.PaillierPrivateKey(public_key, p, q)
+    return per_ballot_tally(public_key, private_key, ballots, num_candidates, slot_bits)
+
+
+def decrypt_ballot_shard(n, p, q, ballots):
+    """
+    Decrypt one shard of individual ballots inside a tally worker process.
+    Takes the key as integers and returns a (vote_vector, error) pair per
+    ballot, so one malformed ballot does not fail the whole shard.
+    """
+    start = time.perf_counter()
+    public_key = paillier.PaillierPublicKey(n)
+    private_key = paillier.PaillierPrivateKey(public_key, p, q)
+
+    results = []
+    for ballot in ballots:
+        try:
+            results.append(([
+                private_key.decrypt(paillier.EncryptedNumber(public_key, ciphertext))
+                for ciphertext in load_encrypted_vote(ballot)
+            ], None))
+        except Exception as e:
+            results.append((None, str(e)))
+
+    return results, time.perf_counter() - start
+
+
+class ShardedTallyEngine:
+    """
+    Computes the homomorphic product of an election's ballots on several cores.
+    Each shard of ballots is multiplied out on the crypto worker pool and the
+    partial aggregates are multiplied together once all shards are done.
+    """
+
+    def __init__(self, crypto, shard_size=5000):
+        self.crypto = crypto
+        self.shard_size = shard_size
+
+    def split(self, ballots):
+        """Split a list of ballots into shards of at most shard_size."""
+        for start in range(0, len(ballots), self.shard_size):
+            yield ballots[start:start + self.shard_size]
+
+    def aggregate(self, public_key, shards):
+        """
+        Aggregate an iterable of ballot shards. Shards are submitted as soon as
+        they are produced, so fetching the next page of votes overlaps with the
+        math on the previous ones.
+        Returns (aggregate, ballot_count, report) where report has the timing
+        of every shard.
+        """
+        pending = [
+            self.crypto.submit('tally_aggregate', aggregate_shard, public_key.n, shard, block=True)
+            for shard in shards
+        ]
+
+        aggregate = []
+        ballot_count = 0
+        report = []
+        for index, result in enumerate(pending):
+            partial, shard_count, seconds = result.result()
+            fold_ballot(public_key, aggregate, partial)
+            ballot_count += shard_count
+            report.append({'shard': index, 'ballots': shard_count, 'seconds': round(seconds, 4)})
+
+        return aggregate, ballot_count, report
+
+    def decrypt(self, public_key, private_key, shards, max_pending=None):
+        """
+        Decrypt shards of individual ballots on the worker pool and yield
+        (results, seconds) per shard in order, as soon as each one is done.
+        At most max_pending shards are queued at once, so a long audit
+        streams instead of holding every result in memory.
+        """
+        max_pending = max_pending or self.crypto.workers * 2
+        pending = deque()
+        for shard in shards:
+            pending.append(self.crypto.submit(
+                'decrypt_batch', decrypt_ballot_shard,
+                public_key.n, private_key.p, private_key.q, shard, block=True
+            ))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def count(self, public_key, private_key, shards, num_candidates, slot_bits=None):
+        """
+        Reference per-ballot count of shards of ballots, each shard decrypted
+        on its own worker. See per_ballot_tally.
+        """
+        pending = [
+            self.crypto.submit(
+                'verify_decrypt', per_ballot_tally_shard,
+                public_key.n, private_key.p, private_key.q, shard, num_candidates, slot_bits, block=True
+            )
+            for shard in shards
+        ]
+
+        counts = [0] * num_candidates
+        for result in pending:
+            counts = [total + count for total, count in zip(counts, result.result())]
+        return counts
+
+
+def is_valid_vote_vector(vote_vector, candidate_count=None):
+    """
+    A ballot must be one-hot: every entry 0 or 1 and exactly one 1.
+    The homomorphic tally relies on this to equal the per-ballot count.
+    With candidate_count it must also have exactly one entry per candidate,
+    a vote past the last candidate would be counted for nobody.
+    """
+    if not isinstance(vote_vector, list) or not vote_vector:
+        return False
+    if candidate_count is not None and len(vote_vector) != candidate_count:
+        return False
+    if any(type(vote) is not int or vote not in (0, 1) for vote in vote_vector):
+        return False
+    return sum(vote_vector) == 1
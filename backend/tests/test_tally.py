@@ -0,0 +1,24 @@
+# test_tally.py
+from tally import is_valid_vote_vector
+
+
+def test_one_hot_vector_is_valid():
+    assert is_valid_vote_vector([0, 1, 0])
+    assert is_valid_vote_vector([0, 1, 0], 3)
+
+
+def test_vector_must_be_one_hot():
+    assert not is_valid_vote_vector([])
+    assert not is_valid_vote_vector([0, 0, 0], 3)
+    assert not is_valid_vote_vector([1, 1, 0], 3)
+    assert not is_valid_vote_vector([0, 2, 0], 3)
+
+
+def test_short_ballot_is_rejected():
+    assert not is_valid_vote_vector([0, 1], 3)
+
+
+def test_long_ballot_is_rejected():
+    # The vote sits past the last of three candidates
+    assert not is_valid_vote_vector([0, 0, 0, 1], 3)
+    assert not is_valid_vote_vector([1, 0, 0, 0], 3)
@@ -0,0 +1,52 @@
+# test_turnout.py
+import time
+
+import pytest
+
+from turnout import TurnoutTracker, TurnoutFull
+
+
+def make_tracker(**kwargs):
+    return TurnoutTracker(lambda election_id: 0, coalesce=0, heartbeat=0.05, **kwargs)
+
+
+def test_closing_before_the_stream_starts_gives_the_slot_back():
+    tracker = make_tracker(max_subscribers=2)
+    for _ in range(2):
+        tracker.subscribe('e', until=time.time() + 60).close()
+
+    assert tracker.stats()['subscribers'] == 0
+    tracker.subscribe('e', until=time.time() + 60).close()
+
+
+def test_closing_after_the_first_update_gives_the_slot_back():
+    tracker = make_tracker(max_subscribers=1)
+    subscription = tracker.subscribe('e', until=time.time() + 60)
+    assert next(iter(subscription))['voters_voted'] == 0
+    subscription.close()
+    subscription.close()
+
+    assert tracker.stats()['subscribers'] == 0
+
+
+def test_subscribers_are_bounded():
+    tracker = make_tracker(max_subscribers=1)
+    subscription = tracker.subscribe('e')
+    with pytest.raises(TurnoutFull):
+        tracker.subscribe('e')
+    subscription.close()
+    assert tracker.stats()['rejected'] == 1
+
+
+def test_updates_count_recorded_ballots():
+    tracker = make_tracker()
+    subscription = tracker.subscribe('e', until=time.time() + 60)
+    updates = iter(subscription)
+    next(updates)
+    tracker.record('e')
+    tracker.record('e')
+
+    update = next(update for update in updates if update is not None)
+    assert update['voters_voted'] == 2
+    assert update['votes_last_minute'] == 2
+    subscription.close()
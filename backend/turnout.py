@@ -0,0 +1,214 @@
+# turnout.py
+from collections import OrderedDict, deque
+import threading
+import time
+
+
+class TurnoutFull(Exception):
+    """Raised when the live turnout stream has max_subscribers already."""
+
+
+class TurnoutSubscription:
+    """
+    One open turnout stream. Iterating it yields updates; close() gives the
+    subscriber slot back, whether or not iteration ever started, and may be
+    called more than once.
+    """
+
+    def __init__(self, tracker, updates):
+        self._tracker = tracker
+        self._updates = updates
+        self._closed = False
+
+    def __iter__(self):
+        try:
+            yield from self._updates
+        finally:
+            self.close()
+
+    def close(self):
+        with self._tracker._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._tracker.subscribers -= 1
+        try:
+            self._updates.close()
+        except ValueError:
+            # Still running on the thread that iterates it, it stops at its next yield
+            pass
+
+
+class _ElectionTurnout:
+    def __init__(self):
+        self.voters_voted = 0
+        # (minute start, ballots) for the last `minutes` minutes
+        self.minutes = deque()
+        self.version = 0
+        self.synced_at = None
+        self.syncing = False
+
+
+class TurnoutTracker:
+    """
+    Live turnout per election, kept in memory and pushed to dashboard streams.
+
+    cast_vote calls record() for every ballot this process stores, which
+    only bumps a counter and the current minute's bucket. Ballots stored by
+    other processes are picked up by re-reading the count with `load(election_id)`
+    at most every `resync` seconds while someone is watching; the new
+    ballots are put in the current minute. The count never goes down, a local
+    ballot may be ahead of what load() sees.
+
+    Subscribers get at most one update every `coalesce` seconds however fast
+    ballots arrive, and no more than max_subscribers streams are open at once.
+    """
+
+    def __init__(self, load, minutes=60, coalesce=1.0, resync=30, heartbeat=15,
+                 max_subscribers=100, max_elections=1024):
+        self.load = load
+        self.window = minutes
+        self.coalesce = coalesce
+        self.resync = resync
+        self.heartbeat = heartbeat
+        self.max_subscribers = max_subscribers
+        self.max_elections = max_elections
+        self.subscribers = 0
+        self.rejected = 0
+        self.updates = 0
+        self._elections = OrderedDict()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def _get(self, election_id):
+        # Caller holds the lock
+        election = self._elections.get(election_id)
+        if election is None:
+            election = self._elections[election_id] = _ElectionTurnout()
+            while len(self._elections) > self.max_elections:
+                self._elections.popitem(last=False)
+        self._elections.move_to_end(election_id)
+        return election
+
+    def _add(self, election, ballots, now):
+        # Caller holds the lock
+        minute = int(now // 60) * 60
+        if election.minutes and election.minutes[-1][0] == minute:
+            election.minutes[-1][1] += ballots
+        else:
+            election.minutes.append([minute, ballots])
+        while election.minutes and election.minutes[0][0] <= minute - 60 * self.window:
+            election.minutes.popleft()
+        election.voters_voted += ballots
+        election.version += 1
+        self._changed.notify_all()
+
+    def record(self, election_id, ballots=1):
+        """Count ballots just stored for an election."""
+        with self._lock:
+            self._add(self._get(str(election_id)), ballots, time.time())
+
+    def forget(self, election_id):
+        with self._lock:
+            self._elections.pop(str(election_id), None)
+
+    def _sync(self, election_id):
+        """Re-read the count if it is older than resync seconds."""
+        with self._lock:
+            election = self._get(election_id)
+            if election.syncing or (
+                election.synced_at is not None and time.monotonic() - election.synced_at < self.resync
+            ):
+                return
+            election.syncing = True
+
+        try:
+            loaded = self.load(election_id)
+        except Exception as e:
+            print(f"Error loading turnout for {election_id}: {str(e)}")
+            loaded = None
+
+        with self._lock:
+            election.syncing = False
+            first = election.synced_at is None
+            election.synced_at = time.monotonic()
+            if loaded is not None and loaded > election.voters_voted:
+                if first:
+                    # Ballots from before we were counting, not part of the rate
+                    election.voters_voted = loaded
+                    election.version += 1
+                    self._changed.notify_all()
+                else:
+                    self._add(election, loaded - election.voters_voted, time.time())
+
+    def _state(self, election_id, election):
+        # Caller holds the lock
+        now = int(time.time() // 60) * 60
+        buckets = {minute: ballots for minute, ballots in election.minutes}
+        # Minutes without ballots are sent as zeros, oldest first
+        rate = [
+            {'minute': minute, 'votes': buckets.get(minute, 0)}
+            for minute in range(now - 60 * (self.window - 1), now + 60, 60)
+        ]
+        return {
+            'election_id': election_id,
+            'voters_voted': election.voters_voted,
+            'votes_last_minute': buckets.get(now, 0),
+            'rate': rate
+        }
+
+    def subscribe(self, election_id, until=None):
+        """
+        Take a subscriber slot for an election, raising TurnoutFull if there
+        is none left. Returns a TurnoutSubscription yielding updates: a
+        turnout dict, or None for a heartbeat. It ends at the `until`
+        wall-clock time. The caller must close() it to give the slot back.
+        """
+        with self._lock:
+            if self.subscribers >= self.max_subscribers:
+                self.rejected += 1
+                raise TurnoutFull()
+            self.subscribers += 1
+        return TurnoutSubscription(self, self._updates(str(election_id), until))
+
+    def _updates(self, election_id, until):
+        seen = None
+        last_sent = time.monotonic()
+        while until is None or time.time() < until:
+            self._sync(election_id)
+
+            with self._lock:
+                election = self._get(election_id)
+                # Sleep until a ballot, the next resync, the heartbeat or the end
+                timeout = min(self.heartbeat - (time.monotonic() - last_sent), self.resync)
+                if until is not None:
+                    timeout = min(timeout, until - time.time())
+                if election.version == seen and timeout > 0:
+                    self._changed.wait(timeout)
+
+                state = None
+                if election.version != seen:
+                    seen = election.version
+                    state = self._state(election_id, election)
+                    self.updates += 1
+
+            if state is not None:
+                yield state
+                last_sent = time.monotonic()
+                # Ballots arriving in the meantime go out together in the next update
+                time.sleep(self.coalesce)
+            elif time.monotonic() - last_sent >= self.heartbeat:
+                yield None
+                last_sent = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': self.subscribers,
+                'max_subscribers': self.max_subscribers,
+                'rejected': self.rejected,
+                'updates': self.updates,
+                'elections': len(self._elections),
+                'coalesce': self.coalesce,
+                'resync': self.resync
+            }
@@ -0,0 +1,161 @@
+# voted_index.py
+import hashlib
+import math
+import threading
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings. A miss is definite, a hit may be a
+    false positive at roughly error_rate once capacity items are added.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(capacity, 1)
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + index * second) % self.size for index in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class _ElectionVotes:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded = False
+        # Exact set of voters seen voting; with a Bloom filter only those since warm-up
+        self.voters = set()
+        self.bloom = None
+
+
+class VotedIndex:
+    """
+    Per-election set of voters who have already cast a ballot, so duplicate
+    checks skip the database and double votes are rejected atomically.
+
+    An election is warmed from `load(election_id)` (the voter_ids already in
+    Votes) on first use. When more than bloom_threshold ballots are loaded,
+    they go into a Bloom filter instead of the set to bound memory; a Bloom
+    hit is then confirmed with the `confirm` callback passed by the caller.
+
+    The index is per process. The unique (election_id, voter_id) index on
+    Votes still backs it up across processes.
+    """
+
+    def __init__(self, load, bloom_threshold=100000, bloom_error_rate=0.001):
+        self.load = load
+        self.bloom_threshold = bloom_threshold
+        self.bloom_error_rate = bloom_error_rate
+        self.hits = 0
+        self.bloom_checks = 0
+        self.rejected = 0
+        self._elections = {}
+        self._lock = threading.Lock()
+
+    def _get(self, election_id):
+        election_id = str(election_id)
+        with self._lock:
+            election = self._elections.setdefault(election_id, _ElectionVotes())
+
+        if not election.loaded:
+            with election.lock:
+                if not election.loaded:
+                    self._warm(election_id, election)
+        return election
+
+    def _warm(self, election_id, election):
+        # Caller holds election.lock
+        voter_ids = [str(voter_id) for voter_id in self.load(election_id)]
+        if self.bloom_threshold and len(voter_ids) > self.bloom_threshold:
+            election.bloom = BloomFilter(len(voter_ids), self.bloom_error_rate)
+            for voter_id in voter_ids:
+                election.bloom.add(voter_id)
+        else:
+            election.voters.update(voter_ids)
+        election.loaded = True
+
+    def warm(self, election_id):
+        self._get(election_id)
+
+    def _lookup(self, election, voter_id):
+        """
+        Caller holds election.lock. True or False, or None for a Bloom hit
+        that still needs confirming.
+        """
+        if voter_id in election.voters:
+            self.hits += 1
+            return True
+        if election.bloom is not None and voter_id in election.bloom:
+            self.bloom_checks += 1
+            return None
+        return False
+
+    def has_voted(self, election_id, voter_id, confirm=None):
+        """
+        Whether the voter already voted. confirm() is only called to settle
+        a Bloom filter hit and should check the database. It runs without
+        the election's lock held, other ballots do not wait for it.
+        """
+        election = self._get(election_id)
+        with election.lock:
+            voted = self._lookup(election, str(voter_id))
+        if voted is None:
+            return bool(confirm and confirm())
+        return voted
+
+    def claim(self, election_id, voter_id, confirm=None):
+        """
+        Atomically mark the voter as having voted. Returns False if they
+        already had, in which case the ballot must be rejected.
+        """
+        election = self._get(election_id)
+        voter_id = str(voter_id)
+        with election.lock:
+            voted = self._lookup(election, voter_id)
+            if voted is False:
+                election.voters.add(voter_id)
+                return True
+
+        # Confirm a Bloom hit outside the lock, then check nobody claimed meanwhile
+        if voted is None:
+            voted = bool(confirm and confirm())
+        with election.lock:
+            if voted or voter_id in election.voters:
+                self.rejected += 1
+                return False
+            election.voters.add(voter_id)
+            return True
+
+    def release(self, election_id, voter_id):
+        """Undo a claim whose ballot could not be stored."""
+        election = self._get(election_id)
+        with election.lock:
+            election.voters.discard(str(voter_id))
+
+    def stats(self):
+        with self._lock:
+            elections = {
+                election_id: {
+                    'voters': len(election.voters),
+                    'bloom_bits': election.bloom.size if election.bloom else 0
+                }
+                for election_id, election in self._elections.items()
+            }
+        return {
+            'elections': elections,
+            'hits': self.hits,
+            'bloom_checks': self.bloom_checks,
+            'rejected': self.rejected
+        }
@@ -0,0 +1,157 @@
+# voter_import.py
+from datetime import datetime
+import time
+import uuid
+import openpyxl
+import pandas as pd
+
+REQUIRED_COLUMNS = ['name', 'email', 'gender']
+EMAIL_PATTERN = r'^[^@\s]+@[^@\s]+\.[^@\s]+$'
+
+
+def read_voter_chunks(file, filename, chunk_size):
+    """
+    Yield DataFrames of at most chunk_size rows from an uploaded CSV or XLSX
+    file without loading the whole file. Every cell is read as text.
+    """
+    if filename.lower().endswith('.csv'):
+        yield from pd.read_csv(file, chunksize=chunk_size, dtype=str, keep_default_na=False)
+        return
+
+    # read_only mode parses the sheet row by row instead of building it in memory
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = ['' if cell is None else str(cell) for cell in next(rows, ())]
+
+        chunk = []
+        for row in rows:
+            chunk.append(row[:len(header)])
+            if len(chunk) == chunk_size:
+                yield pd.DataFrame(chunk, columns=header, dtype=str)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header, dtype=str)
+    finally:
+        workbook.close()
+
+
+def normalize_columns(df):
+    return df.rename(columns=lambda column: str(column).strip().lower())
+
+
+def missing_columns(df):
+    columns = set(normalize_columns(df).columns)
+    return [column for column in REQUIRED_COLUMNS if column not in columns]
+
+
+class VoterImporter:
+    """
+    Validates, deduplicates and inserts a voter roll chunk by chunk.
+
+    run() is a generator of progress events, so the caller can stream them
+    to the client while the file is still being read. Memory use is bounded
+    by the chunk size plus the set of emails already seen.
+    """
+
+    def __init__(self, election_id, insert_batch, existing_emails, batch_size=500,
+                 max_retries=3, retry_delay=0.5, max_new_voters=None):
+        self.election_id = election_id
+        self.insert_batch = insert_batch
+        self.existing_emails = existing_emails
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_new_voters = max_new_voters
+        self.file_emails = set()
+        self.processed = 0
+        self.inserted = 0
+        self.rejected = 0
+
+    def validate(self, df, first_row):
+        """
+        Normalize a chunk and split it into accepted rows and a Series of
+        rejection reasons, all with vectorized column operations.
+        """
+        df = normalize_columns(df)[REQUIRED_COLUMNS].fillna('').astype(str)
+        for column in REQUIRED_COLUMNS:
+            df[column] = df[column].str.strip()
+        df['email'] = df['email'].str.lower()
+        df['gender'] = df['gender'].str.lower().str.capitalize()
+        # Spreadsheet row number, the header is row 1
+        df.index = pd.RangeIndex(first_row, first_row + len(df))
+
+        reasons = pd.Series('', index=df.index)
+        checks = [
+            ((df[REQUIRED_COLUMNS] == '').any(axis=1), 'missing required field'),
+            (~df['email'].str.match(EMAIL_PATTERN), 'invalid email'),
+            (df['email'].isin(self.existing_emails), 'email already registered'),
+            (df['email'].isin(self.file_emails) | df['email'].duplicated(), 'duplicate email in file'),
+        ]
+        for failed, reason in checks:
+            reasons = reasons.mask(failed & (reasons == ''), reason)
+
+        accepted = df[reasons == '']
+        if self.max_new_voters is not None:
+            room = max(self.max_new_voters - self.inserted, 0)
+            overflow = accepted.index[room:]
+            reasons[overflow] = 'voter roll is full'
+            accepted = accepted.iloc[:room]
+
+        self.file_emails.update(accepted['email'])
+        return df, accepted, reasons[reasons != '']
+
+    def insert_with_retry(self, voters):
+        """Insert one batch, retrying with backoff. Returns the error or None."""
+        error = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.insert_batch(voters)
+                return None
+            except Exception as e:
+                error = e
+                time.sleep(self.retry_delay * (2 ** attempt))
+        return str(error)
+
+    def run(self, chunks):
+        first_row = 2
+        for chunk in chunks:
+            df, accepted, reasons = self.validate(chunk, first_row)
+            first_row += len(df)
+            self.processed += len(df)
+
+            for row, reason in reasons.items():
+                self.rejected += 1
+                yield {'event': 'rejected', 'row': int(row), 'email': df.at[row, 'email'], 'reason': reason}
+
+            created_at = datetime.now().isoformat()
+            for start in range(0, len(accepted), self.batch_size):
+                batch = accepted.iloc[start:start + self.batch_size]
+                # voter_ids are fixed before the first attempt, so retries are idempotent
+                voters = [
+                    {
+                        'voter_id': str(uuid.uuid4()),
+                        'name': name,
+                        'email': email,
+                        'gender': gender,
+                        'election_id': self.election_id,
+                        'created_at': created_at
+                    }
+                    for name, email, gender in zip(batch['name'], batch['email'], batch['gender'])
+                ]
+
+                error = self.insert_with_retry(voters)
+                if error is None:
+                    self.inserted += len(voters)
+                    continue
+
+                for row, email in zip(batch.index, batch['email']):
+                    self.rejected += 1
+                    yield {'event': 'rejected', 'row': int(row), 'email': email, 'reason': f'insert failed: {error}'}
+
+            yield {'event': 'progress', **self.summary()}
+
+        yield {'event': 'done', **self.summary()}
+
+    def summary(self):
+        return {'processed': self.processed, 'inserted': self.inserted, 'rejected': self.rejected}
@@ -31,11 +31,13 @@ const VoteDecryptForm = () => {
         throw new Error('Please fill in all fields');
       }
 
-      // Try to parse the encrypted vote to ensure it's valid JSON
-      try {
-        JSON.parse(encryptedVote);
-      } catch {
-        throw new Error('Invalid encrypted vote format. Please ensure it is valid JSON');
+      // Older receipts are JSON lists, newer ones are a single base64 string
+      if (encryptedVote.trim().startsWith('[')) {
+        try {
+          JSON.parse(encryptedVote);
+        } catch {
+          throw new Error('Invalid encrypted vote format. Please ensure it is valid JSON');
+        }
       }
 
       const response = await fetch(`${serverUrl}//api/vote/decrypt`, {
@@ -31,6 +31,8 @@ const ElectionDashboard = () => {
   const [timeRemaining, setTimeRemaining] = useState(0);
   const [timeRemainingEnd, setTimeRemainingEnd] = useState(0);
   const [votersVotedNow, setVotersVotedNow] = useState(0);
+  const [voteRate, setVoteRate] = useState([]);
+  const [resultsVersion, setResultsVersion] = useState(0);
   const electionId = localStorage.getItem("election_id");
   const serverUrl = import.meta.env.VITE_SERVER_URL;
 
@@ -70,7 +72,38 @@ const ElectionDashboard = () => {
     };
 
     fetchData();
-  }, []);
+  }, [resultsVersion]);
+
+  useEffect(() => {
+    if (!electionOngoing) return;
+
+    // Turnout is pushed by the server while the election is open
+    const source = new EventSource(
+      `${serverUrl}/api/election/${electionId}/turnout/stream`
+    );
+    source.addEventListener("turnout", (event) => {
+      const data = JSON.parse(event.data);
+      setVotersVotedNow(data.voters_voted);
+      setVoteRate(
+        data.rate.map(({ minute, votes }) => ({
+          minute: new Date(minute * 1000).toLocaleTimeString([], {
+            hour: "2-digit",
+            minute: "2-digit",
+          }),
+          votes,
+        }))
+      );
+    });
+    source.addEventListener("closed", () => {
+      // The election just ended, load its results
+      source.close();
+      setElectionOngoing(false);
+      setLoading(true);
+      setResultsVersion((version) => version + 1);
+    });
+
+    return () => source.close();
+  }, [electionOngoing]);
 
   useEffect(() => {
     // Set up an interval to update the countdown every second
@@ -177,6 +210,19 @@ const ElectionDashboard = () => {
           <p className="text-center text-gray-600 mt-4">
             Voters voted now: <span className="font-bold">{votersVotedNow}</span>
           </p>
+          {voteRate.length > 0 && (
+            <div className="mt-4">
+              <h3 className="text-sm font-medium text-gray-600 mb-2 text-center">
+                Votes per minute
+              </h3>
+              <BarChart width={600} height={200} data={voteRate}>
+                <CartesianGrid strokeDasharray="3 3" />
+                <XAxis dataKey="minute" interval={9} />
+                <YAxis allowDecimals={false} />
+                <Bar dataKey="votes" fill="#4F46E5" />
+              </BarChart>
+            </div>
+          )}
         </div>
       </div>
     );
@@ -39,6 +39,20 @@ export default function ElectionForm() {
     fetchOngoingElection();
   }, [serverUrl]);
 
+  const waitForElectionJob = async (statusUrl) => {
+    for (;;) {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      const response = await fetch(`${serverUrl}${statusUrl}`);
+      const job = await response.json();
+      if (!response.ok || job.status === 'failed') {
+        throw new Error(job.error || 'Failed to create election');
+      }
+      if (job.status === 'done') {
+        return job.result;
+      }
+    }
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
 
@@ -62,6 +76,12 @@ export default function ElectionForm() {
       }
 
       const result = await response.json();
+
+      // No pre-generated keypair was available, wait for the background job
+      if (response.status === 202) {
+        await waitForElectionJob(result.status_url);
+      }
+
       console.log('Election created:', result);
       localStorage.setItem("election_id", result.election_id);
 
@@ -1,6 +1,7 @@
 import { useEffect, useState } from "react";
 import { Check, Circle } from "lucide-react";
 import { useNavigate } from "react-router-dom";
+import { encryptBallot } from "../utils/ballotCrypto";
 
 const VotingInterface = () => {
   const [candidates, setCandidates] = useState([]);
@@ -12,6 +13,7 @@ const VotingInterface = () => {
   const [electionId, setElectionId] = useState(null);
   const [hasVoted, setHasVoted] = useState(false);
   const [electionEnded, setElectionEnded] = useState(false);
+  const [encryption, setEncryption] = useState(null); // Set when the ballot is encrypted here
   const navigate = useNavigate();
   const voterId = localStorage.getItem("voter_id");
   const serverUrl = import.meta.env.VITE_SERVER_URL;
@@ -26,6 +28,7 @@ const VotingInterface = () => {
         if (response.ok) {
           setCandidates(data.candidates || []);
           setElectionId(data.election_id);
+          setEncryption(data.encryption || null);
           console.log("Candidates loaded:", data.candidates);
           console.log("Election ID:", data.election_id);
           const currentTime = new Date();
@@ -62,6 +65,16 @@ const VotingInterface = () => {
     setVotingStatus(null); // Clear any previous message
 
     try {
+      // Encrypt locally when the server asks for it, it then only checks the proofs
+      const ballot = encryption
+        ? await encryptBallot(
+            encryption,
+            electionId,
+            voterId,
+            candidates.findIndex((candidate) => candidate.id === selectedCandidate)
+          )
+        : { voteVector }; // Send one-hot vector to backend
+
       const response = await fetch(`${serverUrl}/api/election/castVote`, {
         method: "POST",
         headers: {
@@ -70,7 +83,7 @@ const VotingInterface = () => {
         body: JSON.stringify({
           voterId,
           electionId: electionId,
-          voteVector, // Send one-hot vector to backend
+          ...ballot,
         }),
       });
 
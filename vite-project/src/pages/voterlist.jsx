@@ -3,29 +3,51 @@ import { Search, UserPlus, Trash2 } from "lucide-react";
 import AddVoterModal from "../components/AddVoterModal.jsx";
 import axios from "axios";
 
+const PAGE_SIZE = 100;
+
 const VoterListPage = () => {
   const [isModalOpen, setIsModalOpen] = useState(false);
   const [searchTerm, setSearchTerm] = useState("");
   const [voters, setVoters] = useState([]);
+  const [totalVoters, setTotalVoters] = useState(0);
+  // Cursor of every page visited so far, the first page has none
+  const [cursors, setCursors] = useState([null]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [file, setFile] = useState(null);
   const [uploading, setUploading] = useState(false);
   const [uploadStatus, setUploadStatus] = useState("");
   const serverUrl = import.meta.env.VITE_SERVER_URL;
   const electionId = localStorage.getItem("election_id");
-  // Fetch voters from API when component loads
+  const page = cursors.length - 1;
+
+  // Fetch one page of voters whenever the page changes
   useEffect(() => {
     const fetchVoters = async () => {
       try {
-        const response = await axios.get(`${serverUrl}/api/voters/${electionId}`);
-        console.log("Server response:", response.data);
+        const after = cursors[page];
+        const response = await axios.get(`${serverUrl}/api/voters/${electionId}`, {
+          params: { limit: PAGE_SIZE, ...(after && { after }) },
+        });
         setVoters(response.data.voters);
-        return
+        setNextCursor(response.data.next_cursor);
+        // Only the first page comes with the total
+        if (response.data.total !== undefined) {
+          setTotalVoters(response.data.total);
+        }
       } catch (error) {
         console.error("Error fetching voters:", error);
       }
     };
     fetchVoters();
-  }, [electionId, serverUrl]); 
+  }, [electionId, serverUrl, cursors, page]);
+
+  const handleNextPage = () => {
+    if (nextCursor) setCursors([...cursors, nextCursor]);
+  };
+
+  const handlePreviousPage = () => {
+    if (page > 0) setCursors(cursors.slice(0, -1));
+  };
   
 
   const handleAddVoter = async (newVoter) => {
@@ -37,6 +59,7 @@ const VoterListPage = () => {
 
       const addedVoter = await response.data;
       setVoters([...voters, addedVoter]);
+      setTotalVoters(totalVoters + 1);
       setIsModalOpen(false);
 
     } catch (error) {
@@ -53,6 +76,7 @@ const VoterListPage = () => {
 
       if (response.ok) {
         setVoters(voters.filter((voter) => voter.voter_id !== voterId));
+        setTotalVoters(totalVoters - 1);
       } else {
         console.error("Failed to delete voter");
       }
@@ -69,7 +93,7 @@ const VoterListPage = () => {
     (voter) =>
       voter.name.toLowerCase().includes(searchTerm.toLowerCase()) ||
       voter.email.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      voter.voter_d.toLowerCase().includes(searchTerm.toLowerCase())
+      voter.voter_id.toLowerCase().includes(searchTerm.toLowerCase())
   );
 
   const handleFileChange = (e) => {
@@ -93,7 +117,12 @@ const VoterListPage = () => {
       const response = await axios.post(`${serverUrl}/api/voter/bulk-register`, formData, {
         headers: { 'Content-Type': 'multipart/form-data' },
       });
-      setUploadStatus(`${response.data.count} voters registered successfully!`);
+      const rejected = response.data.rejected || [];
+      setUploadStatus(
+        rejected.length
+          ? `${response.data.count} voters registered, ${rejected.length} rows rejected (first: row ${rejected[0].row}, ${rejected[0].reason}).`
+          : `${response.data.count} voters registered successfully!`
+      );
     } catch (error) {
       setUploadStatus(`Error: ${error.response ? error.response.data.error : error.message}`);
     } finally {
@@ -107,7 +136,7 @@ const VoterListPage = () => {
       <div className="mb-6">
         <div className="bg-gradient-to-r from-blue-50 to-blue-100 rounded-xl p-6">
           <h2 className="text-2xl font-bold text-gray-800">
-            Total Voters: {voters.length}
+            Total Voters: {totalVoters}
           </h2>
         </div>
       </div>
@@ -222,13 +251,16 @@ const VoterListPage = () => {
                 <div>
                   <p className="text-sm text-gray-600">
                     Showing{" "}
-                    <span className="font-semibold text-gray-800">1</span> to{" "}
                     <span className="font-semibold text-gray-800">
-                      {filteredVoters.length}
+                      {voters.length ? page * PAGE_SIZE + 1 : 0}
+                    </span>{" "}
+                    to{" "}
+                    <span className="font-semibold text-gray-800">
+                      {page * PAGE_SIZE + voters.length}
                     </span>{" "}
                     of{" "}
                     <span className="font-semibold text-gray-800">
-                      {voters.length}
+                      {totalVoters}
                     </span>{" "}
                     entries
                   </p>
@@ -237,6 +269,8 @@ const VoterListPage = () => {
                 <div className="inline-flex gap-x-2">
                   <button
                     type="button"
+                    onClick={handlePreviousPage}
+                    disabled={page === 0}
                     className="py-2 px-3 inline-flex items-center gap-x-2 text-sm font-medium rounded-lg border border-gray-200 bg-white text-gray-800 shadow-sm hover:bg-gray-50 disabled:opacity-50 disabled:pointer-events-none"
                   >
                     <svg
@@ -255,6 +289,8 @@ const VoterListPage = () => {
 
                   <button
                     type="button"
+                    onClick={handleNextPage}
+                    disabled={!nextCursor}
                     className="py-2 px-3 inline-flex items-center gap-x-2 text-sm font-medium rounded-lg border border-gray-200 bg-white text-gray-800 shadow-sm hover:bg-gray-50 disabled:opacity-50 disabled:pointer-events-none"
                   >
                     Next
@@ -284,7 +320,7 @@ const VoterListPage = () => {
       <div className="bg-white p-4 rounded-xl shadow-sm mb-4">
         <input
           type="file"
-          accept=".xlsx, .xls"
+          accept=".csv, .xlsx"
           onChange={handleFileChange}
           disabled={uploading}
         />
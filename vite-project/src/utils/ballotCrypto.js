@@ -0,0 +1,147 @@
+// Paillier encryption of a ballot in the browser, with the proofs that it is
+// well formed. The server checks them in backend/ballot_proofs.py, keep the
+// two in step.
+
+const CHALLENGE_BITS = 128n;
+
+const mod = (value, modulus) => ((value % modulus) + modulus) % modulus;
+
+const modPow = (base, exponent, modulus) => {
+  let result = 1n;
+  base = mod(base, modulus);
+  while (exponent > 0n) {
+    if (exponent & 1n) result = (result * base) % modulus;
+    base = (base * base) % modulus;
+    exponent >>= 1n;
+  }
+  return result;
+};
+
+const modInverse = (value, modulus) => {
+  let [oldR, r] = [mod(value, modulus), modulus];
+  let [oldS, s] = [1n, 0n];
+  while (r !== 0n) {
+    const quotient = oldR / r;
+    [oldR, r] = [r, oldR - quotient * r];
+    [oldS, s] = [s, oldS - quotient * s];
+  }
+  return mod(oldS, modulus);
+};
+
+const gcd = (a, b) => {
+  while (b !== 0n) [a, b] = [b, a % b];
+  return a;
+};
+
+const randomBits = (bits) => {
+  const bytes = new Uint8Array(Math.ceil(bits / 8));
+  crypto.getRandomValues(bytes);
+  const hex = Array.from(bytes, (byte) => byte.toString(16).padStart(2, "0")).join("");
+  return BigInt("0x" + hex) & ((1n << BigInt(bits)) - 1n);
+};
+
+// Uniform enough: 64 extra random bits before reducing
+const randomUnit = (n) => {
+  for (;;) {
+    const r = randomBits(n.toString(2).length + 64) % n;
+    if (r > 0n && gcd(r, n) === 1n) return r;
+  }
+};
+
+// Fiat-Shamir challenge over the same string ballot_proofs.challenge hashes
+const challenge = async (context, n, ciphertext, commitments) => {
+  const message = [context, n, ciphertext, ...commitments].map(String).join("|");
+  const digest = await crypto.subtle.digest("SHA-256", new TextEncoder().encode(message));
+  const hex = Array.from(new Uint8Array(digest), (byte) => byte.toString(16).padStart(2, "0")).join("");
+  return BigInt("0x" + hex) % (1n << CHALLENGE_BITS);
+};
+
+// c / g^m mod n^2, with g = n + 1
+const dividePlaintext = (n, nsquare, ciphertext, plaintext) =>
+  mod(ciphertext * (1n - plaintext * n), nsquare);
+
+const proveMembership = async (n, ciphertext, r, allowed, index, context) => {
+  const nsquare = n * n;
+  const rho = randomUnit(n);
+  const commitments = [];
+  const challenges = [];
+  const responses = [];
+
+  allowed.forEach((plaintext, position) => {
+    if (position === index) {
+      commitments.push(modPow(rho, n, nsquare));
+      challenges.push(0n);
+      responses.push(0n);
+      return;
+    }
+    // Simulate the branches that are not true
+    const u = dividePlaintext(n, nsquare, ciphertext, plaintext);
+    const e = randomBits(Number(CHALLENGE_BITS));
+    const z = randomUnit(n);
+    commitments.push((modPow(z, n, nsquare) * modInverse(modPow(u, e, nsquare), nsquare)) % nsquare);
+    challenges.push(e);
+    responses.push(z);
+  });
+
+  const total = await challenge(context, n, ciphertext, commitments);
+  const others = challenges.reduce((sum, e) => sum + e, 0n);
+  challenges[index] = mod(total - others, 1n << CHALLENGE_BITS);
+  responses[index] = (rho * modPow(r, challenges[index], n)) % n;
+
+  return {
+    a: commitments.map(String),
+    e: challenges.map(String),
+    z: responses.map(String),
+  };
+};
+
+const proveSum = async (n, ciphertexts, randomness, context) => {
+  const nsquare = n * n;
+  const product = ciphertexts.reduce((acc, c) => (acc * c) % nsquare, 1n);
+  const u = dividePlaintext(n, nsquare, product, 1n);
+  const combined = randomness.reduce((acc, r) => (acc * r) % n, 1n);
+
+  const rho = randomUnit(n);
+  const a = modPow(rho, n, nsquare);
+  const e = await challenge(context, n, u, [a]);
+  return { a: String(a), z: String((rho * modPow(combined, e, n)) % n) };
+};
+
+/**
+ * Encrypt a vote for the candidate at choiceIndex with the `encryption`
+ * parameters from /api/election/candidates, and prove it is well formed.
+ * Returns the encryptedVote and proof fields of the castVote request.
+ */
+export const encryptBallot = async (encryption, electionId, voterId, choiceIndex) => {
+  const n = BigInt(encryption.public_key.n);
+  const nsquare = n * n;
+  const count = encryption.candidates;
+  const packed = encryption.ballot_mode === "packed";
+
+  // A packed ballot is one ciphertext with the chosen candidate's slot set
+  const allowed = packed
+    ? Array.from({ length: count }, (_, index) => 1n << BigInt(index * encryption.slot_bits))
+    : [0n, 1n];
+  const choices = packed
+    ? [choiceIndex]
+    : Array.from({ length: count }, (_, index) => (index === choiceIndex ? 1 : 0));
+
+  const context = `${electionId}:${voterId}`;
+  const ciphertexts = [];
+  const randomness = [];
+  const slots = [];
+
+  for (const [slot, choice] of choices.entries()) {
+    const r = randomUnit(n);
+    const ciphertext = ((1n + allowed[choice] * n) * modPow(r, n, nsquare)) % nsquare;
+    slots.push(await proveMembership(n, ciphertext, r, allowed, choice, `${context}:${slot}`));
+    ciphertexts.push(ciphertext);
+    randomness.push(r);
+  }
+
+  const proof = { slots };
+  if (!packed) {
+    proof.sum = await proveSum(n, ciphertexts, randomness, `${context}:sum`);
+  }
+  return { encryptedVote: ciphertexts.map(String), proof };
+};